@@ -0,0 +1,72 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from benchmarks.utils import (
+    create_products, create_restaurant, get_client, measure, rollback_atomic,
+    summarize_timings
+)
+from foodcartapp.cache_versions import set_version
+from foodcartapp.models import Product
+from foodcartapp.renderers import dump_json
+from foodcartapp.views import serialize_product
+
+ENDPOINTS = ['/api/products/', '/api/banners/']
+
+ENCODINGS = ['identity', 'gzip', 'br']
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает размер и время ответов публичного API в разных режимах'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        client = get_client()
+        repeat = options['repeat']
+
+        with rollback_atomic():
+            create_products(options['products'], create_restaurant())
+
+            products = Product.objects.select_related('category').available()
+            catalog = [serialize_product(product) for product in products]
+            encoders = {
+                'indent=4': lambda: json.dumps(
+                    catalog, cls=DjangoJSONEncoder,
+                    ensure_ascii=False, indent=4,
+                ).encode(),
+                'compact': lambda: dump_json(catalog),
+            }
+            for name, encode in encoders.items():
+                started_at = time.perf_counter()
+                for _ in range(repeat):
+                    content = encode()
+                elapsed_ms = (time.perf_counter() - started_at) / repeat * 1000
+                self.stdout.write(
+                    f'encode {name:<9} {len(content):>8} bytes '
+                    f'{elapsed_ms:.3f}ms'
+                )
+
+            for url in ENDPOINTS:
+                for query in ['?pretty=1', '']:
+                    for encoding in ENCODINGS:
+                        def get():
+                            return client.get(
+                                url + query,
+                                HTTP_ACCEPT_ENCODING=encoding,
+                            )
+
+                        set_version('catalog')
+                        response = get()
+                        timings, _ = measure(get, repeat)
+                        summary = summarize_timings(timings)
+                        self.stdout.write(
+                            f'{url + query:<25} {encoding:<8} '
+                            f'{response.get("Content-Encoding", "-"):<5} '
+                            f'{len(response.content):>8} bytes '
+                            f'p50={summary["p50_ms"]}ms'
+                        )
@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from benchmarks.seed import seed_benchmark_data
+from benchmarks.utils import rollback_atomic
+from foodcartapp.assignment import get_restaurants_load, propose_assignments
+
+
+def get_total_cost(proposals, load_penalty):
+    # суммарное расстояние плюс штраф за очередь в каждом ресторане
+    loads = get_restaurants_load()
+    total_cost = 0
+    for proposal in proposals:
+        restaurant_id = proposal['restaurant'].id
+        total_cost += proposal['distance'] \
+            + load_penalty * loads.get(restaurant_id, 0)
+        loads[restaurant_id] = loads.get(restaurant_id, 0) + 1
+    return total_cost
+
+
+class Command(BaseCommand):
+    help = 'Замеряет автоматическое назначение ресторанов открытым заказам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--restaurants', type=int, default=50)
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--load-penalty', type=float, default=1.0)
+
+    def handle(self, *args, **options):
+        load_penalty = options['load_penalty']
+        with rollback_atomic():
+            seed_benchmark_data(
+                options['orders'],
+                options['restaurants'],
+                options['products'],
+            )
+
+            # nearest - ближайший подходящий ресторан без учёта загрузки
+            variants = {
+                'nearest': {'load_penalty': 0, 'max_passes': 0},
+                'greedy': {'load_penalty': load_penalty, 'max_passes': 0},
+                'greedy + local search': {'load_penalty': load_penalty},
+            }
+            for name, variant_options in variants.items():
+                started_at = time.perf_counter()
+                proposals = propose_assignments(**variant_options)
+                elapsed = time.perf_counter() - started_at
+
+                loads = {}
+                for proposal in proposals:
+                    restaurant_id = proposal['restaurant'].id
+                    loads[restaurant_id] = loads.get(restaurant_id, 0) + 1
+                self.stdout.write(
+                    f'{name:<22} {elapsed * 1000:8.1f} ms  '
+                    f'заказов: {len(proposals)}  '
+                    f'стоимость: {get_total_cost(proposals, load_penalty):.1f}  '
+                    f'км: {sum(p["distance"] for p in proposals):.1f}  '
+                    f'макс. на ресторан: {max(loads.values(), default=0)}'
+                )
@@ -0,0 +1,70 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from benchmarks.seed import seed_catalog
+from benchmarks.utils import measure, rollback_atomic, summarize_timings
+from foodcartapp.models import Product, RestaurantMenuItem
+
+
+def get_products_in_subquery():
+    # прежняя реализация ProductQuerySet.available, для сравнения
+    products = (
+        RestaurantMenuItem.objects
+        .filter(availability=True)
+        .values_list('product')
+    )
+    return Product.objects.select_related('category').filter(pk__in=products)
+
+
+def get_products_exists():
+    return Product.objects.select_related('category').available()
+
+
+QUERIES = {
+    'pk__in': get_products_in_subquery,
+    'exists': get_products_exists,
+}
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает планы и время запроса доступных товаров каталога'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurants', type=int, default=200)
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        with rollback_atomic():
+            seed_catalog(
+                random.Random(options['seed']),
+                options['restaurants'],
+                options['products'],
+            )
+            # планировщику нужна свежая статистика по новым строкам
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            product_ids = {}
+            for name, get_products in QUERIES.items():
+                queryset = get_products()
+                self.stdout.write(f'--- {name}')
+                self.stdout.write(queryset.explain())
+
+                timings, _ = measure(
+                    lambda: list(get_products()),
+                    options['repeat']
+                )
+                self.stdout.write(' '.join(
+                    f'{key}={value}'
+                    for key, value in summarize_timings(timings).items()
+                ))
+                product_ids[name] = set(
+                    queryset.values_list('id', flat=True)
+                )
+
+            if product_ids['pk__in'] != product_ids['exists']:
+                self.stderr.write('Запросы вернули разные товары')
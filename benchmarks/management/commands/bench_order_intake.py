@@ -0,0 +1,116 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory
+
+from benchmarks.utils import create_products
+from foodcartapp.intake import process_intake_batch
+from foodcartapp.models import Order, OrderIntake, Product, ProductCategory
+from foodcartapp.views import register_order
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность приёма заказов напрямую '
+        'и через очередь OrderIntake. Заказы коммитятся по-настоящему, '
+        'а в конце удаляются'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=500)
+        parser.add_argument(
+            '--lines',
+            type=int,
+            default=5,
+            help='число позиций в заказе',
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=1,
+            help='число параллельных клиентов, больше 1 - только с Postgres',
+        )
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def post_orders(self, products, orders_count, threads):
+        factory = APIRequestFactory()
+        payload = {
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79001234567',
+            'address': 'Москва, ул. Тверская, 1',
+            'products': [
+                {'product': product.pk, 'quantity': 2}
+                for product in products
+            ],
+        }
+
+        def post_order(_):
+            request = factory.post(
+                '/api/order/',
+                payload,
+                format='json',
+                HTTP_IDEMPOTENCY_KEY=str(uuid.uuid4()),
+            )
+            response = register_order(request)
+            assert response.status_code in (201, 202), response.data
+            if threads > 1:
+                connection.close()
+
+        started_at = time.perf_counter()
+        if threads > 1:
+            with ThreadPoolExecutor(threads) as executor:
+                list(executor.map(post_order, range(orders_count)))
+        else:
+            for number in range(orders_count):
+                post_order(number)
+        return time.perf_counter() - started_at
+
+    def report(self, title, orders_count, elapsed):
+        self.stdout.write(
+            f'{title}: {orders_count} заказов за {elapsed:.2f}s, '
+            f'{orders_count / elapsed:.0f} заказов/с'
+        )
+
+    def handle(self, *args, **options):
+        orders_count = options['orders']
+        last_order_id = Order.objects.order_by('-id') \
+            .values_list('id', flat=True).first() or 0
+        last_intake_id = OrderIntake.objects.order_by('-id') \
+            .values_list('id', flat=True).first() or 0
+        products = create_products(options['lines'])
+        try:
+            with override_settings(GEOCODE_ON_ORDER_CREATE=False):
+                elapsed = self.post_orders(
+                    products, orders_count, options['threads']
+                )
+                self.report('Напрямую', orders_count, elapsed)
+
+                with override_settings(ORDER_INTAKE_QUEUE=True):
+                    accept_elapsed = self.post_orders(
+                        products, orders_count, options['threads']
+                    )
+                self.report('Очередь, приём', orders_count, accept_elapsed)
+
+                started_at = time.perf_counter()
+                while process_intake_batch(options['batch_size']):
+                    pass
+                drain_elapsed = time.perf_counter() - started_at
+                self.report('Очередь, перенос', orders_count, drain_elapsed)
+
+            failed = OrderIntake.objects.filter(
+                id__gt=last_intake_id
+            ).exclude(status='DONE').count()
+            if failed:
+                self.stderr.write(f'Не перенесено заказов: {failed}')
+        finally:
+            OrderIntake.objects.filter(id__gt=last_intake_id).delete()
+            Order.objects.filter(id__gt=last_order_id).delete()
+            Product.objects.filter(id__in=[p.id for p in products]).delete()
+            ProductCategory.objects.filter(
+                id=products[0].category_id
+            ).delete()
@@ -0,0 +1,64 @@
+import uuid
+
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory
+
+from benchmarks.utils import (
+    count_statements, create_products, measure, rollback_atomic,
+    summarize_timings
+)
+from foodcartapp.views import register_order
+
+
+class Command(BaseCommand):
+    help = 'Замеряет число INSERT и время оформления заказа через register_order'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lines',
+            type=int,
+            nargs='+',
+            default=[1, 10, 50],
+            help='число позиций в заказе',
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+
+        with rollback_atomic():
+            products = create_products(max(options['lines']))
+
+            for lines in options['lines']:
+                payload = {
+                    'firstname': 'Иван',
+                    'lastname': 'Петров',
+                    'phonenumber': '+79001234567',
+                    'address': 'Москва, ул. Тверская, 1',
+                    'products': [
+                        {'product': product.pk, 'quantity': 2}
+                        for product in products[:lines]
+                    ],
+                }
+
+                # новый Idempotency-Key на каждый запрос, иначе одинаковые
+                # тела склеятся как повторы и замерится повтор, а не заказ
+                def post_order():
+                    request = factory.post(
+                        '/api/order/',
+                        payload,
+                        format='json',
+                        HTTP_IDEMPOTENCY_KEY=str(uuid.uuid4()),
+                    )
+                    response = register_order(request)
+                    assert response.status_code == 201, response.data
+                    assert 'Idempotent-Replayed' not in response
+
+                timings, queries = measure(post_order, options['repeat'])
+                summary = summarize_timings(timings)
+                self.stdout.write(
+                    f'{lines:>3} lines: '
+                    f'INSERT={count_statements(queries, "INSERT")} '
+                    f'SELECT={count_statements(queries, "SELECT")} '
+                    f'p50={summary["p50_ms"]}ms p95={summary["p95_ms"]}ms'
+                )
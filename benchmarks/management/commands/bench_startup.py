@@ -0,0 +1,81 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from benchmarks.utils import summarize_timings
+
+# время django.setup() замеряется в отдельном процессе,
+# как при запуске воркера gunicorn
+SETUP_SCRIPT = '''
+import time
+started_at = time.perf_counter()
+import django
+django.setup()
+print(time.perf_counter() - started_at)
+'''
+
+
+def run_setup(extra_args=()):
+    completed_process = subprocess.run(
+        [sys.executable, *extra_args, '-c', SETUP_SCRIPT],
+        cwd=settings.BASE_DIR,
+        env={
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': os.environ.get(
+                'DJANGO_SETTINGS_MODULE', 'star_burger.settings'
+            ),
+        },
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return completed_process
+
+
+def get_slowest_imports(stderr, limit):
+    # формат -X importtime: "import time: self [us] | cumulative | package"
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, package = line[len('import time:'):].split('|')
+        # учитываются только импорты верхнего уровня
+        if package.startswith('  '):
+            continue
+        imports.append((int(cumulative), package.strip()))
+    return sorted(imports, reverse=True)[:limit]
+
+
+class Command(BaseCommand):
+    help = 'Замеряет время django.setup() в новом процессе'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument(
+            '--imports',
+            type=int,
+            default=15,
+            help='сколько самых медленных импортов показать',
+        )
+
+    def handle(self, *args, **options):
+        timings = [
+            float(run_setup().stdout.split()[-1])
+            for _ in range(options['repeat'])
+        ]
+        summary = summarize_timings(timings)
+        self.stdout.write(
+            'django.setup(): ' + ' '.join(
+                f'{name}={value}' for name, value in summary.items()
+            )
+        )
+
+        stderr = run_setup(['-X', 'importtime']).stderr
+        self.stdout.write('Самые медленные импорты:')
+        for cumulative, package in get_slowest_imports(
+            stderr, options['imports']
+        ):
+            self.stdout.write(f'{cumulative / 1000:>10.1f} ms  {package}')
@@ -0,0 +1,140 @@
+import json
+import os
+import platform
+import time
+import uuid
+from datetime import datetime
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from benchmarks.seed import seed_benchmark_data
+from benchmarks.utils import benchmark, get_client, rollback_atomic
+from foodcartapp.cache_versions import set_version
+
+RESULTS_DIR = os.path.join(settings.BASE_DIR, 'benchmarks', 'results')
+
+
+class Command(BaseCommand):
+    help = 'Замеряет оформление заказа, каталог и страницу заказов менеджера'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            type=int,
+            nargs='+',
+            default=[1000],
+            help='число открытых заказов, например 1000 10000 100000',
+        )
+        parser.add_argument('--restaurants', type=int, default=50)
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--output',
+            help='файл для результатов в JSON, по умолчанию '
+                 'benchmarks/results/<время запуска>.json',
+        )
+
+    def handle(self, *args, **options):
+        started_at = datetime.now()
+        results = {
+            'started_at': started_at.isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'runs': [],
+        }
+
+        # DEBUG включает debug_toolbar и копит запросы в памяти,
+        # замеры с ним не похожи на продакшен
+        with override_settings(
+            DEBUG=False,
+            GEOCODER='coordinates.geocoding.stub_geocoder',
+            GEOCODE_ON_ORDER_CREATE=False,
+        ):
+            results['debug'] = settings.DEBUG
+            for scale in options['scale']:
+                results['runs'].append(self.run_scale(scale, options))
+
+        output = options['output'] or os.path.join(
+            RESULTS_DIR, f'{started_at:%Y%m%d-%H%M%S}.json'
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as results_file:
+            json.dump(results, results_file, ensure_ascii=False, indent=2)
+        self.stdout.write(f'Результаты сохранены в {output}')
+
+    def run_scale(self, scale, options):
+        repeat = options['repeat']
+        with rollback_atomic():
+            seeding_started_at = time.perf_counter()
+            data = seed_benchmark_data(
+                scale, options['restaurants'], options['products']
+            )
+            seeding_time = time.perf_counter() - seeding_started_at
+
+            client = get_client()
+            client.force_login(data['manager'])
+            order_payload = json.dumps({
+                'firstname': 'Иван',
+                'lastname': 'Петров',
+                'phonenumber': '+79001234567',
+                'address': 'Москва, ул. Тверская, 1',
+                'products': [
+                    {'product': product.pk, 'quantity': 1}
+                    for product in data['products'][:3]
+                ],
+            })
+
+            # новый Idempotency-Key на каждый запрос, иначе одинаковые
+            # тела склеятся как повторы и замерится повтор, а не заказ
+            def register_order():
+                response = client.post(
+                    '/api/order/',
+                    order_payload,
+                    content_type='application/json',
+                    HTTP_IDEMPOTENCY_KEY=str(uuid.uuid4()),
+                )
+                assert response.status_code == 201, response.content
+                assert 'Idempotent-Replayed' not in response
+
+            # новая версия каталога, а не cache.clear(): общий кэш
+            # нужен и другим процессам. Версия меняется сразу, bump_version
+            # внутри rollback_atomic дождался бы коммита, которого нет
+            def product_list_cold():
+                set_version('catalog')
+                product_list()
+
+            def product_list():
+                assert client.get('/api/products/').status_code == 200
+
+            def view_orders():
+                assert client.get('/manager/orders/').status_code == 200
+
+            endpoints = {
+                'register_order': register_order,
+                'product_list_api': product_list,
+                'product_list_api_cold': product_list_cold,
+                'view_orders': view_orders,
+            }
+            run = {
+                'scale': scale,
+                'restaurants': options['restaurants'],
+                'products': options['products'],
+                'seeding_s': round(seeding_time, 2),
+                'endpoints': {},
+            }
+            for name, func in endpoints.items():
+                result = benchmark(func, repeat)
+                run['endpoints'][name] = result
+                self.stdout.write(
+                    f'scale={scale} {name:<22} '
+                    f'p50={result["p50_ms"]}ms p95={result["p95_ms"]}ms '
+                    f'p99={result["p99_ms"]}ms '
+                    f'queries={result["queries_max"]} '
+                    f'peak={result["peak_memory_kb"]}KB'
+                )
+        return run
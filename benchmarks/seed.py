@@ -0,0 +1,132 @@
+import random
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+
+from coordinates.addresses import get_address_hash
+from coordinates.geocoding import stub_geocoder
+from coordinates.models import Coordinates
+from foodcartapp.models import (
+    Order, OrderItem, Product, ProductCategory, Restaurant, RestaurantMenuItem
+)
+
+BATCH_SIZE = 2000
+
+STREETS = ['Тверская', 'Арбат', 'Мясницкая', 'Пятницкая', 'Покровка', 'Сретенка']
+
+
+def seed_catalog(rng, restaurants_count, products_count):
+    ProductCategory.objects.bulk_create([
+        ProductCategory(name=f'benchmark {number}') for number in range(5)
+    ])
+    categories = list(ProductCategory.objects.filter(name__startswith='benchmark'))
+
+    Restaurant.objects.bulk_create([
+        Restaurant(
+            name=f'benchmark {number}',
+            address=f'Москва, {rng.choice(STREETS)}, {number}',
+            lat=Decimal('55.55') + Decimal(rng.randint(0, 40000)) / 100000,
+            long=Decimal('37.35') + Decimal(rng.randint(0, 50000)) / 100000,
+        )
+        for number in range(restaurants_count)
+    ])
+    restaurants = list(Restaurant.objects.filter(name__startswith='benchmark'))
+
+    Product.objects.bulk_create([
+        Product(
+            name=f'benchmark {number}',
+            category=rng.choice(categories),
+            price=rng.randint(100, 900),
+            image='benchmark.jpg',
+            description='Сочная котлета, свежие овощи и фирменный соус',
+        )
+        for number in range(products_count)
+    ], batch_size=BATCH_SIZE)
+    products = list(Product.objects.filter(name__startswith='benchmark'))
+
+    RestaurantMenuItem.objects.bulk_create([
+        RestaurantMenuItem(
+            restaurant=restaurant,
+            product=product,
+            availability=rng.random() < 0.9,
+        )
+        for restaurant in restaurants
+        for product in products
+        if rng.random() < 0.8
+    ], batch_size=BATCH_SIZE)
+    return restaurants, products
+
+
+def seed_orders(rng, orders_count, products):
+    addresses = [
+        f'Москва, ул. {rng.choice(STREETS)}, {number}'
+        for number in range(orders_count)
+    ]
+    for start in range(0, len(addresses), BATCH_SIZE):
+        Coordinates.objects.bulk_create([
+            Coordinates(
+                address=address,
+                address_hash=get_address_hash(address),
+                long=place[0],
+                lat=place[1],
+            )
+            for address in addresses[start:start + BATCH_SIZE]
+            for place in [stub_geocoder(address, None)]
+        ], ignore_conflicts=True)
+    coordinates_ids = dict(
+        Coordinates.objects.filter(address__in=addresses)
+        .values_list('address', 'id')
+    )
+
+    for start in range(0, orders_count, BATCH_SIZE):
+        batch_addresses = addresses[start:start + BATCH_SIZE]
+        orders = Order.objects.bulk_create([
+            Order(
+                address=address,
+                customer_first_name='benchmark',
+                customer_last_name=str(number),
+                phonenumber='+79001234567',
+                status=rng.choice(['NEW', 'NEW', 'IN_PROGRESS']),
+                coordinates_id=coordinates_ids.get(address),
+            )
+            for number, address in enumerate(batch_addresses, start)
+        ])
+        if orders[0].pk is None:
+            orders = list(
+                Order.objects.filter(customer_first_name='benchmark')
+                .order_by('-pk')[:len(batch_addresses)]
+            )
+
+        order_items = []
+        for order in orders:
+            for product in rng.sample(products, rng.randint(1, 4)):
+                quantity = rng.randint(1, 3)
+                order_items.append(OrderItem(
+                    order=order,
+                    product=product,
+                    quantity=quantity,
+                    price=product.price * quantity,
+                ))
+        OrderItem.objects.bulk_create(order_items, batch_size=BATCH_SIZE)
+
+    Order.objects.filter(customer_first_name='benchmark') \
+        .recalculate_total_price()
+
+
+def seed_benchmark_data(orders_count, restaurants_count=50,
+                        products_count=200, seed=42):
+    rng = random.Random(seed)
+    restaurants, products = seed_catalog(
+        rng, restaurants_count, products_count
+    )
+    seed_orders(rng, orders_count, products)
+    manager = User.objects.create_user(
+        username='benchmark-manager',
+        password='benchmark',
+        is_staff=True,
+    )
+    return {
+        'manager': manager,
+        'restaurants': restaurants,
+        'products': products,
+    }
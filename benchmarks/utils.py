@@ -0,0 +1,120 @@
+import math
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from foodcartapp.models import (
+    Product, ProductCategory, Restaurant, RestaurantMenuItem
+)
+
+
+@contextmanager
+def rollback_atomic():
+    # всё, что создано внутри бенчмарка, откатывается
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def percentile(values, percent):
+    ordered_values = sorted(values)
+    rank = math.ceil(percent / 100 * len(ordered_values))
+    return ordered_values[max(rank, 1) - 1]
+
+
+def summarize_timings(timings):
+    timings_ms = [timing * 1000 for timing in timings]
+    return {
+        'min_ms': round(min(timings_ms), 3),
+        'mean_ms': round(statistics.mean(timings_ms), 3),
+        'p50_ms': round(percentile(timings_ms, 50), 3),
+        'p95_ms': round(percentile(timings_ms, 95), 3),
+        'p99_ms': round(percentile(timings_ms, 99), 3),
+        'max_ms': round(max(timings_ms), 3),
+    }
+
+
+def measure(func, repeat):
+    timings = []
+    queries = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured_queries:
+            started_at = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started_at)
+        queries.append([query['sql'] for query in captured_queries])
+    return timings, queries
+
+
+def measure_peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def benchmark(func, repeat, warmup=1):
+    for _ in range(warmup):
+        func()
+    timings, queries = measure(func, repeat)
+    queries_counts = [len(run_queries) for run_queries in queries]
+    return {
+        'repeat': repeat,
+        **summarize_timings(timings),
+        'queries_mean': round(statistics.mean(queries_counts), 2),
+        'queries_max': max(queries_counts),
+        'peak_memory_kb': round(measure_peak_memory(func) / 1024, 1),
+    }
+
+
+def count_statements(queries, statement):
+    return max(
+        (
+            sum(1 for sql in run_queries if sql.lstrip().startswith(statement))
+            for run_queries in queries
+        ),
+        default=0
+    )
+
+
+def get_client():
+    return Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+
+
+def create_products(count, restaurant=None):
+    category = ProductCategory.objects.create(name='benchmark')
+    Product.objects.bulk_create([
+        Product(
+            name=f'benchmark {number}',
+            category=category,
+            price=100 + number,
+            image='benchmark.jpg',
+            description='Сочная котлета, свежие овощи и фирменный соус',
+        )
+        for number in range(count)
+    ])
+    products = list(Product.objects.filter(category=category).order_by('pk'))
+    if restaurant:
+        RestaurantMenuItem.objects.bulk_create([
+            RestaurantMenuItem(restaurant=restaurant, product=product)
+            for product in products
+        ])
+    return products
+
+
+def create_restaurant(name='benchmark'):
+    return Restaurant.objects.create(
+        name=name,
+        address='Москва, ул. Тверская, 1',
+        lat=55.757,
+        long=37.611,
+    )
@@ -62,6 +62,16 @@ class App extends Component {
 
     let csrfToken = document.querySelector("[name=csrfmiddlewaretoken]").value;
 
+    let body = JSON.stringify(data);
+    // повторная отправка того же заказа идёт с тем же ключом,
+    // и сервер не создаст дубль
+    if (this.checkoutBody !== body){
+      this.checkoutBody = body;
+      this.checkoutKey = window.crypto && window.crypto.randomUUID
+        ? window.crypto.randomUUID()
+        : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+    }
+
     try {
       let response = await fetch(url, {
         method: 'post',
@@ -69,8 +79,9 @@ class App extends Component {
           'Accept': 'application/json',
           'Content-Type': 'application/json',
           'X-CSRFToken': csrfToken,
+          'Idempotency-Key': this.checkoutKey,
         },
-        body: JSON.stringify(data),
+        body: body,
       });
 
       if (!response.ok){
@@ -78,6 +89,17 @@ class App extends Component {
         return;
       }
       let responseData = await response.json();
+      // 202 - заказ в очереди, он ещё может не пройти проверку
+      if (response.status === 202){
+        responseData = await this.waitForOrderIntake(responseData);
+        if (responseData.status !== 'DONE'){
+          // исправленный заказ уйдёт с новым ключом
+          this.checkoutBody = null;
+          alert('Ошибка при оформлении заказа. Проверьте корзину или свяжитесь с нами по телефону.');
+          return;
+        }
+      }
+      this.checkoutBody = null;
 
       this.setState({
         cart: [],
@@ -93,6 +115,20 @@ class App extends Component {
   }
 
 
+  async waitForOrderIntake(intake){
+    while (intake.status === 'PENDING'){
+      await new Promise(resolve => setTimeout(resolve, 1000));
+      let response = await fetch(intake.status_url, {
+        headers: {'Accept': 'application/json'},
+      });
+      if (!response.ok){
+        throw new Error(`Order intake status: ${response.status}`);
+      }
+      intake = await response.json();
+    }
+    return intake;
+  }
+
   updateToken(NewToken){
 
     this.setState({
@@ -1,6 +1,10 @@
 import React, {Component} from 'react';
 import Counter from './Counter';
 
+function getSrcSet(thumbnails, format){
+  return thumbnails.map(size => `${size[format]} ${size.width}w`).join(', ');
+}
+
 class Product extends Component{
   state = {
     isAdded: false,
@@ -39,13 +43,27 @@ class Product extends Component{
 
   render(){
     let image = this.props.product.image;
+    let thumbnails = this.props.product.thumbnails || [];
     let name = this.props.product.name;
     let price = this.props.product.price;
     let id = this.props.product.id;
     return (
       <div className="product">
         <div className="product-image">
-          <img src={image} alt={name} onClick={this.quickView.bind(this)}/>
+          {thumbnails.length ? (
+            <picture>
+              <source type="image/webp" srcSet={getSrcSet(thumbnails, 'webp')} sizes="250px"/>
+              <img
+                src={image}
+                srcSet={getSrcSet(thumbnails, 'jpeg')}
+                sizes="250px"
+                alt={name}
+                onClick={this.quickView.bind(this)}
+              />
+            </picture>
+          ) : (
+            <img src={image} alt={name} onClick={this.quickView.bind(this)}/>
+          )}
         </div>
         <h4 className="product-name">{name}</h4>
         <p className="product-price currency">{price}</p>
@@ -0,0 +1,48 @@
+import numpy as np
+from django.conf import settings
+from geopy.distance import geodesic
+
+EARTH_RADIUS_KM = 6371.0088
+
+DISTANCE_MODES = ['fast', 'exact']
+
+
+def get_haversine_matrix(points_from, points_to):
+    lat_from, long_from = np.radians(points_from).T[:, :, np.newaxis]
+    lat_to, long_to = np.radians(points_to).T[:, np.newaxis, :]
+
+    hav = (
+        np.sin((lat_to - lat_from) / 2) ** 2
+        + np.cos(lat_from) * np.cos(lat_to)
+        * np.sin((long_to - long_from) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(hav))
+
+
+def get_geodesic_matrix(points_from, points_to):
+    matrix = np.full((len(points_from), len(points_to)), np.nan)
+    for row, point_from in enumerate(points_from):
+        if np.isnan(point_from).any():
+            continue
+        for column, point_to in enumerate(points_to):
+            if np.isnan(point_to).any():
+                continue
+            matrix[row, column] = geodesic(point_from, point_to).km
+    return matrix
+
+
+# расстояния в км между всеми парами точек (широта, долгота),
+# для точек без координат в матрице будет NaN
+def get_distance_matrix(points_from, points_to, mode=None):
+    mode = mode or settings.DISTANCE_MODE
+    if mode not in DISTANCE_MODES:
+        raise ValueError(f'Unknown distance mode: {mode}')
+
+    points_from = np.array(points_from, dtype=float).reshape(-1, 2)
+    points_to = np.array(points_to, dtype=float).reshape(-1, 2)
+
+    if mode == 'exact':
+        matrix = get_geodesic_matrix(points_from, points_to)
+    else:
+        matrix = get_haversine_matrix(points_from, points_to)
+    return np.round(matrix, 2)
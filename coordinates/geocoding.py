@@ -0,0 +1,294 @@
+import hashlib
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import lru_cache
+
+import requests
+import rollbar
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from foodcartapp.coordinates_api_functions import fetch_coordinates
+from foodcartapp.metrics import track_external_call
+from foodcartapp.models import Order
+from .addresses import get_address_hash
+from .lru import LRUCache
+from .models import Coordinates
+
+# адрес, который геокодер не нашёл, тоже кэшируется
+NOT_FOUND = object()
+
+
+def yandex_geocoder(address, session):
+    return fetch_coordinates(
+        settings.YA_API_KEY,
+        address,
+        session=session,
+        timeout=settings.GEOCODER_TIMEOUT,
+    )
+
+
+def stub_geocoder(address, session):
+    # детерминированные координаты в пределах Москвы, для тестов и разработки
+    digest = hashlib.md5(address.encode()).digest()
+    lon = 37.35 + digest[0] / 255 * 0.5
+    lat = 55.55 + digest[1] / 255 * 0.4
+    return f'{lon:.6f}', f'{lat:.6f}'
+
+
+def get_geocoder():
+    return import_string(settings.GEOCODER)
+
+
+def create_session():
+    retries = Retry(
+        total=settings.GEOCODER_RETRIES,
+        backoff_factor=settings.GEOCODER_BACKOFF_FACTOR,
+        status_forcelist=[429, 500, 502, 503, 504],
+    )
+    adapter = HTTPAdapter(
+        max_retries=retries,
+        pool_maxsize=settings.GEOCODER_MAX_WORKERS,
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class GeocoderClient:
+    # запросы к геокодеру идут в пуле потоков через одну keep-alive сессию,
+    # размер пула ограничивает число одновременных запросов
+
+    def __init__(self, geocoder=None, max_workers=None):
+        self.geocoder = geocoder
+        self.session = create_session()
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or settings.GEOCODER_MAX_WORKERS,
+            thread_name_prefix='geocoder',
+        )
+
+    def submit(self, address):
+        geocoder = self.geocoder or get_geocoder()
+        return self.executor.submit(geocoder, address, self.session)
+
+    def fetch_many(self, addresses):
+        if not addresses:
+            return {}
+        places = {}
+        with track_external_call():
+            futures = {
+                address: self.submit(address) for address in addresses
+            }
+            for address, future in futures.items():
+                try:
+                    places[address] = future.result()
+                except (
+                    requests.exceptions.RequestException,
+                    KeyError,
+                    IndexError,
+                    ValueError,
+                ):
+                    # сбой или неожиданный ответ по одному адресу
+                    # не должен ронять всю пачку
+                    rollbar.report_exc_info(
+                        level='warning',
+                        extra_data={'address': address},
+                    )
+        return places
+
+    def close(self):
+        self.executor.shutdown()
+        self.session.close()
+
+
+@lru_cache(maxsize=None)
+def get_geocoder_client():
+    return GeocoderClient()
+
+
+@lru_cache(maxsize=None)
+def get_coordinates_cache():
+    return LRUCache(
+        maxsize=settings.GEOCODER_CACHE_SIZE,
+        ttl=settings.GEOCODER_CACHE_TTL,
+    )
+
+
+def get_coordinates_many(addresses, client=None):
+    # ключ кэшей - хэш нормализованного адреса, поэтому варианты
+    # написания одного адреса не порождают новых запросов и записей
+    address_hashes = {
+        address: get_address_hash(address) for address in addresses
+    }
+    addresses_by_hash = {
+        address_hash: address
+        for address, address_hash in address_hashes.items()
+    }
+    coordinates_cache = get_coordinates_cache()
+
+    places = {}
+    for address_hash in addresses_by_hash:
+        place = coordinates_cache.get(address_hash)
+        if place is not None:
+            places[address_hash] = place
+
+    refresh_before = timezone.now() - timedelta(
+        days=settings.GEOCODER_REFRESH_AFTER_DAYS
+    )
+    stale_coordinates = {}
+    for coordinates in Coordinates.objects.filter(
+        address_hash__in=addresses_by_hash.keys() - places.keys()
+    ):
+        if coordinates.fetched_from_api_at < refresh_before:
+            stale_coordinates[coordinates.address_hash] = coordinates
+            continue
+        place = (coordinates.long, coordinates.lat)
+        places[coordinates.address_hash] = place
+        coordinates_cache.set(coordinates.address_hash, place)
+
+    missing_hashes = sorted(addresses_by_hash.keys() - places.keys())
+    client = client or get_geocoder_client()
+    fetched_places = client.fetch_many(
+        [addresses_by_hash[address_hash] for address_hash in missing_hashes]
+    )
+
+    new_coordinates = []
+    refreshed_coordinates = []
+    for address, place in fetched_places.items():
+        address_hash = address_hashes[address]
+        if not place:
+            places[address_hash] = NOT_FOUND
+            coordinates_cache.set(address_hash, NOT_FOUND)
+            continue
+
+        long, lat = place
+        if address_hash in stale_coordinates:
+            coordinates = stale_coordinates.pop(address_hash)
+            coordinates.long = long
+            coordinates.lat = lat
+            coordinates.fetched_from_api_at = timezone.now()
+            refreshed_coordinates.append(coordinates)
+        else:
+            new_coordinates.append(Coordinates(
+                address=address,
+                address_hash=address_hash,
+                long=long,
+                lat=lat,
+            ))
+        places[address_hash] = place
+        coordinates_cache.set(address_hash, place)
+
+    # если обновить не удалось, устаревшие координаты лучше, чем никаких
+    for address_hash, coordinates in stale_coordinates.items():
+        places[address_hash] = (coordinates.long, coordinates.lat)
+
+    Coordinates.objects.bulk_create(new_coordinates, ignore_conflicts=True)
+    Coordinates.objects.bulk_update(
+        refreshed_coordinates,
+        ['long', 'lat', 'fetched_from_api_at']
+    )
+    return {
+        address: places[address_hash]
+        for address, address_hash in address_hashes.items()
+        if places.get(address_hash, NOT_FOUND) is not NOT_FOUND
+    }
+
+
+def get_coordinates(address, client=None):
+    return get_coordinates_many([address], client).get(address)
+
+
+def get_unlocated_order_addresses():
+    return set(
+        Order.objects.get_noprocessed_orders()
+        .filter(coordinates__isnull=True)
+        .values_list('address', flat=True)
+    )
+
+
+def link_orders_to_coordinates(addresses):
+    coordinates_by_hash = {
+        coordinates.address_hash: coordinates
+        for coordinates in Coordinates.objects.for_addresses(addresses)
+    }
+    for address in addresses:
+        coordinates = coordinates_by_hash.get(get_address_hash(address))
+        if not coordinates:
+            continue
+        Order.objects.filter(address=address) \
+            .exclude(coordinates=coordinates) \
+            .update(coordinates=coordinates, updated_at=timezone.now())
+
+
+def geocode_addresses(addresses=None, client=None):
+    if addresses is None:
+        addresses = get_unlocated_order_addresses()
+    addresses = sorted(set(addresses))
+    batch_size = settings.GEOCODER_BATCH_SIZE
+
+    places = {}
+    for start in range(0, len(addresses), batch_size):
+        places.update(
+            get_coordinates_many(addresses[start:start + batch_size], client)
+        )
+
+    link_orders_to_coordinates(addresses)
+    return places
+
+
+class BackgroundGeocoder:
+    # один долгоживущий поток на процесс: адреса копятся в очереди
+    # и геокодируются пачками, параллельность запросов ограничивает
+    # пул GeocoderClient, а не число созданных заказов
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def submit(self, addresses):
+        self.queue.put(list(addresses))
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.run,
+                    name='background-geocoder',
+                    daemon=True,
+                )
+                self.thread.start()
+
+    def get_batch(self):
+        # ждёт первые адреса и забирает всё, что успело накопиться
+        addresses = set(self.queue.get())
+        while len(addresses) < settings.GEOCODER_BATCH_SIZE:
+            try:
+                addresses.update(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return addresses
+
+    def run(self):
+        while True:
+            addresses = self.get_batch()
+            try:
+                geocode_addresses(addresses)
+            except Exception:
+                rollbar.report_exc_info()
+            finally:
+                connection.close()
+
+
+@lru_cache(maxsize=None)
+def get_background_geocoder():
+    return BackgroundGeocoder()
+
+
+def geocode_addresses_in_background(addresses):
+    get_background_geocoder().submit(addresses)
@@ -0,0 +1,29 @@
+import rollbar
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from coordinates.geocoding import (
+    geocode_addresses, get_unlocated_order_addresses
+)
+
+
+class Command(BaseCommand):
+    help = 'Геокодирует адреса необработанных заказов без координат'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'addresses',
+            nargs='*',
+            help='адреса для геокодирования, по умолчанию адреса заказов',
+        )
+
+    def handle(self, *args, **options):
+        # ошибки геокодера отправляются в rollbar
+        rollbar.init(**settings.ROLLBAR)
+        addresses = set(
+            options['addresses'] or get_unlocated_order_addresses()
+        )
+        places = geocode_addresses(addresses)
+        self.stdout.write(
+            f'Найдено координат: {len(places)} из {len(addresses)}'
+        )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from coordinates.addresses import rehash_coordinates
+from coordinates.models import Coordinates
+from foodcartapp.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает хэши нормализованных адресов и удаляет дубли координат'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rehashed, removed = rehash_coordinates(Coordinates, Order)
+        self.stdout.write(
+            f'Обновлено хэшей: {rehashed}, удалено дублей: {removed}'
+        )
@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coordinates', '0007_remove_coordinates_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coordinates',
+            name='address_hash',
+            field=models.CharField(editable=False, max_length=64, null=True, verbose_name='хэш нормализованного адреса'),
+        ),
+    ]
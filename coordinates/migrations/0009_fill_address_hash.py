@@ -0,0 +1,100 @@
+# Generated by Django 3.2 on 2026-10-18 11:21
+
+import hashlib
+import re
+from collections import defaultdict
+
+from django.db import migrations
+
+# копия правил нормализации адресов на момент миграции,
+# чтобы их дальнейшие изменения не меняли эту миграцию
+
+ABBREVIATIONS = {
+    'ул': 'улица',
+    'пр': 'проспект',
+    'пр-т': 'проспект',
+    'пр-кт': 'проспект',
+    'просп': 'проспект',
+    'пер': 'переулок',
+    'пр-д': 'проезд',
+    'пл': 'площадь',
+    'наб': 'набережная',
+    'ш': 'шоссе',
+    'б-р': 'бульвар',
+    'бул': 'бульвар',
+    'бульв': 'бульвар',
+    'туп': 'тупик',
+    'мкр': 'микрорайон',
+    'мкрн': 'микрорайон',
+    'р-н': 'район',
+    'обл': 'область',
+    'г': 'город',
+    'гор': 'город',
+    'д': 'дом',
+    'к': 'корпус',
+    'корп': 'корпус',
+    'стр': 'строение',
+    'кв': 'квартира',
+    'эт': 'этаж',
+    'под': 'подъезд',
+}
+
+re_punctuation = re.compile(r'[^\w\s/-]')
+
+
+def normalize_address(address):
+    address = address.casefold().replace('ё', 'е')
+    tokens = re_punctuation.sub(' ', address).split()
+    return ' '.join(ABBREVIATIONS.get(token, token) for token in tokens)
+
+
+def get_address_hash(address):
+    return hashlib.sha256(normalize_address(address).encode()).hexdigest()
+
+
+def rehash_coordinates(apps, schema_editor):
+    # пересчитывает хэши адресов и склеивает координаты с одинаковым
+    # нормализованным адресом, оставляя самые свежие
+    coordinates_model = apps.get_model('coordinates', 'Coordinates')
+    order_model = apps.get_model('foodcartapp', 'Order')
+    rehashed_coordinates = []
+    coordinates_by_hash = defaultdict(list)
+    for coordinates in coordinates_model.objects \
+            .order_by('-fetched_from_api_at', 'pk').iterator():
+        address_hash = get_address_hash(coordinates.address)
+        if coordinates.address_hash != address_hash:
+            coordinates.address_hash = address_hash
+            rehashed_coordinates.append(coordinates)
+        coordinates_by_hash[address_hash].append(coordinates)
+
+    duplicate_ids = set()
+    for kept_coordinates, *duplicates in coordinates_by_hash.values():
+        if not duplicates:
+            continue
+        ids = [coordinates.pk for coordinates in duplicates]
+        order_model.objects.filter(coordinates_id__in=ids) \
+            .update(coordinates=kept_coordinates)
+        duplicate_ids.update(ids)
+
+    coordinates_model.objects.filter(pk__in=duplicate_ids).delete()
+    rehashed_coordinates = [
+        coordinates for coordinates in rehashed_coordinates
+        if coordinates.pk not in duplicate_ids
+    ]
+    coordinates_model.objects.bulk_update(
+        rehashed_coordinates,
+        ['address_hash'],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coordinates', '0008_coordinates_address_hash'),
+        ('foodcartapp', '0065_link_orders_to_coordinates'),
+    ]
+
+    operations = [
+        migrations.RunPython(rehash_coordinates, migrations.RunPython.noop),
+    ]
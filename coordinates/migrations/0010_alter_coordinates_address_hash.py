@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-18 11:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coordinates', '0009_fill_address_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='coordinates',
+            name='address_hash',
+            field=models.CharField(editable=False, max_length=64, unique=True, verbose_name='хэш нормализованного адреса'),
+        ),
+    ]
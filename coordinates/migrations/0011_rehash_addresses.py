@@ -0,0 +1,126 @@
+# Generated by Django 3.2 on 2026-10-18 12:40
+
+import hashlib
+import re
+from collections import defaultdict
+
+from django.db import migrations
+
+# копия правил нормализации адресов на момент миграции: номера дома
+# без «д.», квартира, этаж и подъезд отбрасываются
+
+ABBREVIATIONS = {
+    'ул': 'улица',
+    'пр': 'проспект',
+    'пр-т': 'проспект',
+    'пр-кт': 'проспект',
+    'просп': 'проспект',
+    'пер': 'переулок',
+    'пр-д': 'проезд',
+    'пл': 'площадь',
+    'наб': 'набережная',
+    'ш': 'шоссе',
+    'б-р': 'бульвар',
+    'бул': 'бульвар',
+    'бульв': 'бульвар',
+    'туп': 'тупик',
+    'мкр': 'микрорайон',
+    'мкрн': 'микрорайон',
+    'р-н': 'район',
+    'обл': 'область',
+    'г': 'город',
+    'гор': 'город',
+    'к': 'корпус',
+    'корп': 'корпус',
+    'стр': 'строение',
+}
+
+# «ул. Ленина 5» и «ул. Ленина, д. 5» - один дом
+HOUSE_MARKERS = {'д', 'дом'}
+
+# квартира, этаж и подъезд не меняют координаты дома,
+# маркер убирается вместе с номером после него
+UNIT_MARKERS = {
+    'кв', 'квартира',
+    'оф', 'офис',
+    'эт', 'этаж',
+    'под', 'подъезд',
+}
+
+re_punctuation = re.compile(r'[^\w\s/-]')
+# «д5», «кв12» - маркер, слитый с номером
+re_glued_marker = re.compile(
+    r'\b({})(\d)'.format('|'.join(HOUSE_MARKERS | UNIT_MARKERS))
+)
+
+
+def normalize_address(address):
+    address = address.casefold().replace('ё', 'е')
+    address = re_glued_marker.sub(r'\1 \2', re_punctuation.sub(' ', address))
+    tokens = address.split()
+    normalized_tokens = []
+    position = 0
+    while position < len(tokens):
+        token = tokens[position]
+        position += 1
+        # маркер без номера после него - обычное слово: «под», «дом»
+        if position < len(tokens) and tokens[position][:1].isdigit():
+            if token in HOUSE_MARKERS:
+                continue
+            if token in UNIT_MARKERS:
+                position += 1
+                continue
+        normalized_tokens.append(ABBREVIATIONS.get(token, token))
+    return ' '.join(normalized_tokens)
+
+
+def get_address_hash(address):
+    return hashlib.sha256(normalize_address(address).encode()).hexdigest()
+
+
+def rehash_coordinates(apps, schema_editor):
+    # пересчитывает хэши адресов и склеивает координаты с одинаковым
+    # нормализованным адресом, оставляя самые свежие
+    coordinates_model = apps.get_model('coordinates', 'Coordinates')
+    order_model = apps.get_model('foodcartapp', 'Order')
+    rehashed_coordinates = []
+    coordinates_by_hash = defaultdict(list)
+    for coordinates in coordinates_model.objects \
+            .order_by('-fetched_from_api_at', 'pk').iterator():
+        address_hash = get_address_hash(coordinates.address)
+        if coordinates.address_hash != address_hash:
+            coordinates.address_hash = address_hash
+            rehashed_coordinates.append(coordinates)
+        coordinates_by_hash[address_hash].append(coordinates)
+
+    duplicate_ids = set()
+    for kept_coordinates, *duplicates in coordinates_by_hash.values():
+        if not duplicates:
+            continue
+        ids = [coordinates.pk for coordinates in duplicates]
+        order_model.objects.filter(coordinates_id__in=ids) \
+            .update(coordinates=kept_coordinates)
+        duplicate_ids.update(ids)
+
+    coordinates_model.objects.filter(pk__in=duplicate_ids).delete()
+    rehashed_coordinates = [
+        coordinates for coordinates in rehashed_coordinates
+        if coordinates.pk not in duplicate_ids
+    ]
+    coordinates_model.objects.bulk_update(
+        rehashed_coordinates,
+        ['address_hash'],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coordinates', '0010_alter_coordinates_address_hash'),
+        ('foodcartapp', '0065_link_orders_to_coordinates'),
+    ]
+
+    operations = [
+        migrations.RunPython(rehash_coordinates, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,18 @@
 from django.db import models
 from django.utils import timezone
 
+from .addresses import get_address_hash
+
+
+class CoordinatesQuerySet(models.QuerySet):
+    def for_address(self, address):
+        return self.filter(address_hash=get_address_hash(address))
+
+    def for_addresses(self, addresses):
+        return self.filter(
+            address_hash__in={get_address_hash(address) for address in addresses}
+        )
+
 
 class Coordinates(models.Model):
     address = models.TextField(
@@ -8,6 +20,12 @@ class Coordinates(models.Model):
         verbose_name='Адрес доставки',
         unique=True
     )
+    address_hash = models.CharField(
+        max_length=64,
+        verbose_name='хэш нормализованного адреса',
+        unique=True,
+        editable=False,
+    )
     lat = models.DecimalField(
         max_digits=11,
         decimal_places=8,
@@ -23,6 +41,7 @@ class Coordinates(models.Model):
         db_index=True
     )
 
+    objects = CoordinatesQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Координаты'
@@ -30,3 +49,7 @@ class Coordinates(models.Model):
 
     def __str__(self):
         return self.address
+
+    def save(self, *args, **kwargs):
+        self.address_hash = get_address_hash(self.address)
+        super().save(*args, **kwargs)
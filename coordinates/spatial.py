@@ -0,0 +1,122 @@
+import heapq
+import math
+
+from .distances import EARTH_RADIUS_KM
+
+
+def to_unit_vector(lat, long):
+    lat, long = math.radians(lat), math.radians(long)
+    return (
+        math.cos(lat) * math.cos(long),
+        math.cos(lat) * math.sin(long),
+        math.sin(lat),
+    )
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * math.asin(min(chord / 2, 1))
+
+
+def km_to_chord(distance_km):
+    return 2 * math.sin(min(distance_km / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+def get_squared_distance(point_a, point_b):
+    return sum((a - b) ** 2 for a, b in zip(point_a, point_b))
+
+
+class KDNode:
+    __slots__ = ['point', 'key', 'axis', 'left', 'right']
+
+    def __init__(self, point, key, axis, left, right):
+        self.point = point
+        self.key = key
+        self.axis = axis
+        self.left = left
+        self.right = right
+
+
+def build_kd_tree(items, depth=0):
+    if not items:
+        return None
+    axis = depth % 3
+    items = sorted(items, key=lambda item: item[0][axis])
+    median = len(items) // 2
+    point, key = items[median]
+    return KDNode(
+        point, key, axis,
+        build_kd_tree(items[:median], depth + 1),
+        build_kd_tree(items[median + 1:], depth + 1),
+    )
+
+
+class GeoIndex:
+    # k-d дерево по точкам на единичной сфере: хорда монотонна
+    # расстоянию по поверхности, поэтому поиск ближайших точный
+
+    def __init__(self, items):
+        self.size = 0
+        tree_items = []
+        for key, lat, long in items:
+            tree_items.append((to_unit_vector(float(lat), float(long)), key))
+            self.size += 1
+        self.root = build_kd_tree(tree_items)
+
+    def __len__(self):
+        return self.size
+
+    def nearest(self, lat, long, k=1, keys=None):
+        if k <= 0:
+            return []
+        target = to_unit_vector(float(lat), float(long))
+        heap = []
+
+        def search(node):
+            if node is None:
+                return
+            if keys is None or node.key in keys:
+                squared_distance = get_squared_distance(target, node.point)
+                if len(heap) < k:
+                    heapq.heappush(heap, (-squared_distance, node.key))
+                elif squared_distance < -heap[0][0]:
+                    heapq.heapreplace(heap, (-squared_distance, node.key))
+
+            diff = target[node.axis] - node.point[node.axis]
+            near, far = (node.left, node.right) if diff < 0 \
+                else (node.right, node.left)
+            search(near)
+            if len(heap) < k or diff ** 2 < -heap[0][0]:
+                search(far)
+
+        search(self.root)
+        return sorted(
+            (
+                (key, chord_to_km(math.sqrt(-squared_distance)))
+                for squared_distance, key in heap
+            ),
+            key=lambda item: item[1]
+        )
+
+    def within(self, lat, long, radius_km, keys=None):
+        target = to_unit_vector(float(lat), float(long))
+        max_squared_distance = km_to_chord(radius_km) ** 2
+        found = []
+
+        def search(node):
+            if node is None:
+                return
+            if keys is None or node.key in keys:
+                squared_distance = get_squared_distance(target, node.point)
+                if squared_distance <= max_squared_distance:
+                    found.append(
+                        (node.key, chord_to_km(math.sqrt(squared_distance)))
+                    )
+
+            diff = target[node.axis] - node.point[node.axis]
+            if diff < 0 or diff ** 2 <= max_squared_distance:
+                search(node.left)
+            if diff >= 0 or diff ** 2 <= max_squared_distance:
+                search(node.right)
+
+        search(self.root)
+        return sorted(found, key=lambda item: item[1])
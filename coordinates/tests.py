@@ -1,3 +1,216 @@
-from django.test import TestCase
+import random
+import threading
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from foodcartapp.models import Order
+from .addresses import get_address_hash, normalize_address
+from .distances import get_haversine_matrix
+from .geocoding import (
+    GeocoderClient, geocode_addresses, get_coordinates_cache, stub_geocoder
+)
+from .models import Coordinates
+from .spatial import GeoIndex
+
+
+class GeoIndexTest(SimpleTestCase):
+
+    def setUp(self):
+        rng = random.Random(42)
+        self.points = [
+            (key, rng.uniform(55.5, 56), rng.uniform(37.3, 37.9))
+            for key in range(2000)
+        ]
+        self.targets = [
+            (rng.uniform(55.4, 56.1), rng.uniform(37.2, 38))
+            for _ in range(50)
+        ]
+        self.index = GeoIndex(self.points)
+        # расстояния перебором: цели × точки
+        self.distances = get_haversine_matrix(
+            self.targets,
+            [(lat, long) for _, lat, long in self.points]
+        )
+
+    def brute_force(self, row, keys=None):
+        return sorted(
+            (
+                (key, self.distances[row, column])
+                for column, (key, _, _) in enumerate(self.points)
+                if keys is None or key in keys
+            ),
+            key=lambda item: item[1]
+        )
+
+    def assertSameNeighbours(self, found, expected):
+        self.assertEqual(len(found), len(expected))
+        for (_, found_km), (_, expected_km) in zip(found, expected):
+            self.assertAlmostEqual(found_km, expected_km, places=6)
+        self.assertEqual(
+            {key for key, _ in found},
+            {key for key, _ in expected}
+        )
+
+    def test_nearest_matches_brute_force(self):
+        for row, (lat, long) in enumerate(self.targets):
+            self.assertSameNeighbours(
+                self.index.nearest(lat, long, k=5),
+                self.brute_force(row)[:5]
+            )
+
+    def test_nearest_with_keys(self):
+        keys = set(range(0, 2000, 7))
+        for row, (lat, long) in enumerate(self.targets):
+            self.assertSameNeighbours(
+                self.index.nearest(lat, long, k=3, keys=keys),
+                self.brute_force(row, keys)[:3]
+            )
+
+    def test_within_matches_brute_force(self):
+        for row, (lat, long) in enumerate(self.targets):
+            expected = [
+                item for item in self.brute_force(row) if item[1] <= 3
+            ]
+            self.assertSameNeighbours(
+                self.index.within(lat, long, 3),
+                expected
+            )
+
+    def test_empty_index(self):
+        index = GeoIndex([])
+        self.assertEqual(index.nearest(55.75, 37.61, k=3), [])
+        self.assertEqual(index.within(55.75, 37.61, 10), [])
+        self.assertEqual(self.index.nearest(55.75, 37.61, k=0), [])
+
+
+class NormalizeAddressTest(SimpleTestCase):
+
+    def assertSameAddress(self, address, other_address):
+        self.assertEqual(
+            get_address_hash(address),
+            get_address_hash(other_address)
+        )
+
+    def test_abbreviations_and_punctuation(self):
+        self.assertEqual(
+            normalize_address('г. Москва, ул. Тверская, 1'),
+            'город москва улица тверская 1'
+        )
+        self.assertSameAddress(
+            'Москва, пр-т Мира, 10',
+            'МОСКВА просп. Мира 10'
+        )
+        self.assertSameAddress('ул. Черёмушки 3', 'ул. Черемушки 3')
+
+    def test_house_marker_is_dropped(self):
+        self.assertSameAddress('ул. Ленина 5', 'ул. Ленина, д. 5')
+        self.assertSameAddress('ул. Ленина 5', 'ул. Ленина, д5')
+        self.assertSameAddress('ул. Ленина 5', 'ул. Ленина, дом 5')
+
+    def test_units_are_dropped(self):
+        self.assertSameAddress(
+            'ул. Ленина, д. 5, кв. 12',
+            'ул. Ленина, д. 5, кв. 7, под. 2, эт. 3'
+        )
+        self.assertSameAddress('ул. Ленина, д. 5, кв12', 'ул. Ленина 5')
+
+    def test_markers_without_number_are_words(self):
+        self.assertEqual(
+            normalize_address('ул. Под Горой, 5'),
+            'улица под горой 5'
+        )
+        self.assertEqual(
+            normalize_address('Дом культуры, ул. Мира 1'),
+            'дом культуры улица мира 1'
+        )
+
+    def test_building_parts_are_kept(self):
+        self.assertNotEqual(
+            get_address_hash('пр-т Мира 10 к. 2'),
+            get_address_hash('пр-т Мира 10 к. 3')
+        )
+
+
+class CountingGeocoder:
+    # заглушка геокодера, которая считает запросы и умеет
+    # не находить или ронять отдельные адреса
+    def __init__(self, not_found=(), failing=()):
+        self.not_found = set(not_found)
+        self.failing = set(failing)
+        self.addresses = []
+        self.lock = threading.Lock()
+
+    def __call__(self, address, session):
+        with self.lock:
+            self.addresses.append(address)
+        if address in self.failing:
+            raise ValueError(address)
+        if address in self.not_found:
+            return None
+        return stub_geocoder(address, session)
+
+
+@override_settings(GEOCODER='coordinates.geocoding.stub_geocoder')
+class GeocodeAddressesTest(TestCase):
+
+    def setUp(self):
+        get_coordinates_cache.cache_clear()
+
+    def geocode(self, addresses, geocoder):
+        client = GeocoderClient(geocoder, max_workers=2)
+        try:
+            return geocode_addresses(addresses, client)
+        finally:
+            client.close()
+
+    def test_orders_get_coordinates(self):
+        order = Order.objects.create(
+            address='ул. Ленина, д. 5',
+            customer_first_name='Иван',
+            phonenumber='+79001234567',
+        )
+        geocoder = CountingGeocoder()
+
+        places = self.geocode(None, geocoder)
+
+        self.assertEqual(
+            places,
+            {order.address: stub_geocoder(order.address, None)}
+        )
+        order.refresh_from_db()
+        self.assertEqual(
+            (order.coordinates.long, order.coordinates.lat),
+            tuple(map(Decimal, places[order.address]))
+        )
+
+    def test_spellings_of_one_address_are_geocoded_once(self):
+        geocoder = CountingGeocoder()
+        self.geocode(['ул. Ленина 5', 'ул. Ленина, дом 5'], geocoder)
+        self.assertEqual(len(geocoder.addresses), 1)
+        self.assertEqual(Coordinates.objects.count(), 1)
+
+    def test_known_addresses_are_not_geocoded_again(self):
+        self.geocode(['ул. Ленина 5'], CountingGeocoder())
+        get_coordinates_cache.cache_clear()
+
+        geocoder = CountingGeocoder()
+        places = self.geocode(['ул. Ленина, д. 5'], geocoder)
+        self.assertEqual(geocoder.addresses, [])
+        self.assertEqual(list(places), ['ул. Ленина, д. 5'])
+
+    def test_not_found_address_is_cached(self):
+        geocoder = CountingGeocoder(not_found=['Нигде'])
+        self.assertEqual(self.geocode(['Нигде'], geocoder), {})
+        self.assertEqual(self.geocode(['Нигде'], geocoder), {})
+        self.assertEqual(geocoder.addresses, ['Нигде'])
+        self.assertFalse(Coordinates.objects.exists())
+
+    def test_failed_address_does_not_break_batch(self):
+        geocoder = CountingGeocoder(failing=['Сбой'])
+        with mock.patch('rollbar.report_exc_info') as report_exc_info:
+            places = self.geocode(['Сбой', 'ул. Ленина 5'], geocoder)
+        self.assertEqual(list(places), ['ул. Ленина 5'])
+        report_exc_info.assert_called_once()
+        self.assertEqual(Coordinates.objects.count(), 1)
@@ -9,6 +9,8 @@ from .models import Restaurant
 from .models import RestaurantMenuItem
 from .models import Order
 from .models import OrderItem
+from .models import OrderIntake
+from .availability import set_menu_availability
 
 from django.http import HttpResponseRedirect
 from django.utils.http import url_has_allowed_host_and_scheme
@@ -16,7 +18,10 @@ from django.utils.encoding import iri_to_uri
 from django.conf import settings
 
 from django.forms import Textarea
-from django.db import models
+from django.db import models, transaction
+
+from coordinates.geocoding import geocode_addresses_in_background
+from coordinates.models import Coordinates
 
 
 class RestaurantMenuItemInline(admin.TabularInline):
@@ -39,6 +44,26 @@ class RestaurantAdmin(admin.ModelAdmin):
     inlines = [
         RestaurantMenuItemInline
     ]
+    actions = [
+        'make_menu_available',
+        'make_menu_unavailable',
+    ]
+
+    @admin.action(description='Открыть всё меню выбранных ресторанов')
+    def make_menu_available(self, request, queryset):
+        updated = set_menu_availability(
+            True,
+            restaurant_ids=list(queryset.values_list('id', flat=True))
+        )
+        self.message_user(request, f'Открыто пунктов меню: {updated}')
+
+    @admin.action(description='Закрыть всё меню выбранных ресторанов')
+    def make_menu_unavailable(self, request, queryset):
+        updated = set_menu_availability(
+            False,
+            restaurant_ids=list(queryset.values_list('id', flat=True))
+        )
+        self.message_user(request, f'Закрыто пунктов меню: {updated}')
 
 
 @admin.register(Product)
@@ -90,6 +115,10 @@ class ProductAdmin(admin.ModelAdmin):
     readonly_fields = [
         'get_image_preview',
     ]
+    actions = [
+        'make_available',
+        'make_unavailable',
+    ]
 
     class Media:
         css = {
@@ -102,7 +131,8 @@ class ProductAdmin(admin.ModelAdmin):
         if not obj.image:
             return 'выберите картинку'
         return format_html(
-            '<img src="{url}" style="max-height: 200px;"/>', url=obj.image.url
+            '<img src="{url}" style="max-height: 200px;"/>',
+            url=obj.get_thumbnail_url(300)
         )
     get_image_preview.short_description = 'превью'
 
@@ -113,10 +143,26 @@ class ProductAdmin(admin.ModelAdmin):
         return format_html(
             '<a href="{edit_url}"><img src="{src}" \
             style="max-height: 50px;"/></a>',
-            edit_url=edit_url, src=obj.image.url
+            edit_url=edit_url, src=obj.get_preview_url()
         )
     get_image_list_preview.short_description = 'превью'
 
+    @admin.action(description='Вернуть в продажу во всех ресторанах')
+    def make_available(self, request, queryset):
+        updated = set_menu_availability(
+            True,
+            product_ids=list(queryset.values_list('id', flat=True))
+        )
+        self.message_user(request, f'Открыто пунктов меню: {updated}')
+
+    @admin.action(description='Снять с продажи во всех ресторанах')
+    def make_unavailable(self, request, queryset):
+        updated = set_menu_availability(
+            False,
+            product_ids=list(queryset.values_list('id', flat=True))
+        )
+        self.message_user(request, f'Закрыто пунктов меню: {updated}')
+
 
 @admin.register(ProductCategory)
 class ProductCategory(admin.ModelAdmin):
@@ -140,6 +186,7 @@ class OrderAdmin(admin.ModelAdmin):
         'id',
         'payment_method',
         'status',
+        'total_price',
         'address',
         'customer_first_name',
         'customer_last_name',
@@ -153,6 +200,36 @@ class OrderAdmin(admin.ModelAdmin):
     inlines = [
         OrderItemInline
     ]
+    actions = [
+        'assign_restaurants',
+    ]
+
+    @admin.action(description='Назначить ближайшие рестораны с учётом загрузки')
+    def assign_restaurants(self, request, queryset):
+        # numpy импортируется только здесь, а не при загрузке админки
+        from .assignment import apply_assignments, propose_assignments
+
+        proposals = propose_assignments(queryset)
+        updated = apply_assignments(proposals)
+        self.message_user(request, f'Назначено заказов: {updated}')
+
+    def save_model(self, request, obj, form, change):
+        address_changed = 'address' in form.changed_data
+        if address_changed:
+            obj.coordinates = Coordinates.objects.for_address(
+                obj.address
+            ).first()
+        super().save_model(request, obj, form, change)
+
+        if address_changed and not obj.coordinates \
+                and settings.GEOCODE_ON_ORDER_CREATE:
+            transaction.on_commit(
+                lambda: geocode_addresses_in_background([obj.address])
+            )
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        Order.objects.filter(pk=form.instance.pk).recalculate_total_price()
 
     def response_change(self, request, obj):
         response = super().response_change(request, obj)
@@ -167,3 +244,22 @@ class OrderAdmin(admin.ModelAdmin):
     formfield_overrides = {
         models.TextField: {'widget': Textarea(attrs={'rows':3, 'cols':45})},
     }
+
+
+@admin.register(OrderIntake)
+class OrderIntakeAdmin(admin.ModelAdmin):
+    list_display = [
+        'token',
+        'status',
+        'order',
+        'created_at',
+        'processed_at',
+    ]
+    list_filter = [
+        'status',
+    ]
+    search_fields = [
+        'token',
+    ]
+    raw_id_fields = ['order']
+    readonly_fields = ['token', 'idempotency_key', 'created_at']
@@ -0,0 +1,191 @@
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+
+from coordinates.distances import get_distance_matrix
+from .models import Order, OrderItem, Restaurant, RestaurantMenuItem
+
+# стоимость назначения в ресторан, который не может собрать заказ
+UNAVAILABLE = 1e9
+
+EPSILON = 1e-9
+
+
+def get_product_restaurant_ids(product_ids, restaurants_by_product):
+    # рестораны, где доступны все товары
+    products_restaurant_ids = [
+        restaurants_by_product.get(product_id, frozenset())
+        for product_id in product_ids
+    ]
+    if not products_restaurant_ids:
+        return frozenset()
+    return frozenset.intersection(*products_restaurant_ids)
+
+
+def get_order_restaurant_ids(order, restaurants_by_product):
+    return get_product_restaurant_ids(
+        [item.product_id for item in order.items.all()],
+        restaurants_by_product
+    )
+
+
+def get_restaurants_load():
+    # загрузка ресторана - число назначенных ему незавершённых заказов
+    return dict(
+        Order.objects.get_noprocessed_orders()
+        .filter(restaurant__isnull=False)
+        .values('restaurant')
+        .annotate(orders_count=Count('id'))
+        .values_list('restaurant', 'orders_count')
+    )
+
+
+def solve_assignment(costs, loads, load_penalty, max_passes=10):
+    # costs - расстояния заказ × ресторан, UNAVAILABLE для неподходящих,
+    # каждый заказ в ресторане с загрузкой L стоит ещё load_penalty * L.
+    # Жадное назначение, затем улучшение переносами и обменами заказов.
+    # Возвращает номер ресторана для каждого заказа, -1 - некуда назначить
+    orders_count, restaurants_count = costs.shape
+    loads = np.array(loads, dtype=float)
+    assignment = np.full(orders_count, -1)
+    if not orders_count or not restaurants_count:
+        return assignment
+
+    available = costs < UNAVAILABLE
+    sorted_costs = np.sort(costs, axis=1)
+    if restaurants_count > 1:
+        regret = sorted_costs[:, 1] - sorted_costs[:, 0]
+    else:
+        regret = np.zeros(orders_count)
+    # первыми назначаются заказы с меньшим выбором ресторанов
+    # и с большим проигрышем, если лучший ресторан окажется занят
+    for row in np.lexsort((-regret, available.sum(axis=1))):
+        if not available[row].any():
+            continue
+        column = int(np.argmin(costs[row] + load_penalty * loads))
+        assignment[row] = column
+        loads[column] += 1
+
+    rows = np.flatnonzero(assignment >= 0)
+    rows_costs = costs[rows]
+    columns = assignment[rows]
+    positions = np.arange(len(rows))
+    for _ in range(max_passes):
+        improved = False
+        for position in positions:
+            column = columns[position]
+            row_costs = rows_costs[position]
+
+            loads[column] -= 1
+            marginal_costs = row_costs + load_penalty * loads
+            best_column = marginal_costs.argmin()
+            if marginal_costs[best_column] < marginal_costs[column] - EPSILON:
+                columns[position] = best_column
+                loads[best_column] += 1
+                improved = True
+                continue
+            loads[column] += 1
+
+            # обмен ресторанами с другим заказом загрузку не меняет
+            deltas = (
+                row_costs[columns]
+                + rows_costs[:, column]
+                - row_costs[column]
+                - rows_costs[positions, columns]
+            )
+            other_position = deltas.argmin()
+            if deltas[other_position] < -EPSILON:
+                columns[position] = columns[other_position]
+                columns[other_position] = column
+                improved = True
+        if not improved:
+            break
+
+    assignment[rows] = columns
+    return assignment
+
+
+def propose_assignments(orders=None, load_penalty=None, max_passes=10):
+    # назначение ресторанов незавершённым заказам без ресторана,
+    # у которых известны координаты. Заказы читаются через values_list,
+    # без создания объектов моделей. max_passes=0 - без улучшения
+    # жадного назначения
+    if orders is None:
+        orders = Order.objects.all()
+    if load_penalty is None:
+        load_penalty = settings.ASSIGNMENT_LOAD_PENALTY_KM
+    orders = orders.get_noprocessed_orders() \
+        .filter(restaurant__isnull=True, coordinates__isnull=False)
+    orders_product_ids = defaultdict(set)
+    for order_id, product_id in OrderItem.objects.filter(
+        order__in=orders.values('id')
+    ).values_list('order_id', 'product_id'):
+        orders_product_ids[order_id].add(product_id)
+
+    orders = list(
+        orders.order_by('id')
+        .values_list('id', 'coordinates__lat', 'coordinates__long')
+    )
+    restaurants = Restaurant.objects.in_bulk()
+    restaurant_ids = list(restaurants)
+    restaurant_columns = {
+        restaurant_id: column
+        for column, restaurant_id in enumerate(restaurant_ids)
+    }
+    restaurants_by_product = RestaurantMenuItem.objects.available() \
+        .get_restaurants_by_product()
+
+    distances = get_distance_matrix(
+        [(lat, long) for _, lat, long in orders],
+        [(restaurant.lat, restaurant.long)
+         for restaurant in restaurants.values()],
+    )
+    costs = np.full(distances.shape, UNAVAILABLE)
+    for row, (order_id, _, _) in enumerate(orders):
+        columns = [
+            restaurant_columns[restaurant_id]
+            for restaurant_id in get_product_restaurant_ids(
+                orders_product_ids[order_id], restaurants_by_product
+            )
+        ]
+        costs[row, columns] = distances[row, columns]
+    costs[np.isnan(costs)] = UNAVAILABLE
+
+    restaurants_load = get_restaurants_load()
+    loads = [
+        restaurants_load.get(restaurant_id, 0)
+        for restaurant_id in restaurant_ids
+    ]
+    assignment = solve_assignment(costs, loads, load_penalty, max_passes)
+
+    return [
+        {
+            'order_id': order_id,
+            'restaurant': restaurants[restaurant_ids[column]],
+            'distance': float(distances[row, column]),
+        }
+        for row, ((order_id, _, _), column) in enumerate(
+            zip(orders, assignment)
+        )
+        if column >= 0
+    ]
+
+
+def apply_assignments(proposals):
+    # заказы, которым за это время назначили ресторан, не трогаются
+    order_ids_by_restaurant = {}
+    for proposal in proposals:
+        order_ids_by_restaurant.setdefault(
+            proposal['restaurant'].id, []
+        ).append(proposal['order_id'])
+
+    updated = 0
+    for restaurant_id, order_ids in order_ids_by_restaurant.items():
+        updated += Order.objects.filter(
+            id__in=order_ids,
+            restaurant__isnull=True,
+        ).update(restaurant_id=restaurant_id, updated_at=timezone.now())
+    return updated
@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from star_burger.replicas import primary_reads
+
+from .cache_versions import bump_version, get_version
+from .models import Restaurant, RestaurantMenuItem
+
+
+class AvailabilityMatrix:
+    # доступность товаров по ресторанам: по числу-маске на товар,
+    # порядок битов задаёт restaurant_ids
+
+    def __init__(self, restaurant_ids, masks):
+        self.restaurant_ids = restaurant_ids
+        self.masks = masks
+
+    def get_row(self, product_id):
+        mask = self.masks.get(product_id, 0)
+        return [
+            bool(mask >> position & 1)
+            for position in range(len(self.restaurant_ids))
+        ]
+
+
+def build_availability_matrix():
+    with primary_reads():
+        restaurant_ids = tuple(
+            Restaurant.objects.order_by('name', 'id')
+            .values_list('id', flat=True)
+        )
+        masks = RestaurantMenuItem.objects.available() \
+            .get_availability_masks(restaurant_ids)
+    return AvailabilityMatrix(restaurant_ids, masks)
+
+
+def get_availability_matrix():
+    cache_key = 'availability_matrix:{}:{}'.format(
+        get_version('menu'),
+        get_version('restaurants'),
+    )
+    return cache.get_or_set(
+        cache_key,
+        build_availability_matrix,
+        settings.CATALOG_CACHE_TIMEOUT
+    )
+
+
+def set_menu_availability(availability, restaurant_ids=None, product_ids=None):
+    # один UPDATE и один сброс кэшей вместо сохранения каждого пункта меню
+    # с сигналами. Меняются только существующие пункты меню,
+    # None означает все рестораны или все товары
+    menu_items = RestaurantMenuItem.objects.exclude(availability=availability)
+    if restaurant_ids is not None:
+        menu_items = menu_items.filter(restaurant_id__in=restaurant_ids)
+    if product_ids is not None:
+        menu_items = menu_items.filter(product_id__in=product_ids)
+
+    updated = menu_items.update(availability=availability)
+    if updated:
+        bump_version('catalog')
+        bump_version('menu')
+    return updated
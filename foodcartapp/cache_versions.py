@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def get_version_key(name):
+    return f'version:{name}'
+
+
+def get_version(name):
+    return cache.get_or_set(
+        get_version_key(name),
+        time.time_ns,
+        timeout=settings.CACHE_VERSION_TIMEOUT
+    )
+
+
+def set_version(name):
+    # новая версия сразу, без ожидания коммита
+    cache.set(
+        get_version_key(name),
+        time.time_ns(),
+        timeout=settings.CACHE_VERSION_TIMEOUT
+    )
+
+
+def bump_version(name):
+    # после коммита, иначе параллельный запрос успеет собрать кэш
+    # из ещё не закоммиченных данных и сохранить его под новой версией.
+    # Вне транзакции версия меняется сразу
+    transaction.on_commit(lambda: set_version(name))
@@ -7,13 +7,13 @@ def parse_coordinates(coord_obj):
     return coordinates['long'], coordinates['lat']
 
 
-def fetch_coordinates(apikey, address):
+def fetch_coordinates(apikey, address, session=requests, timeout=None):
     base_url = "https://geocode-maps.yandex.ru/1.x"
-    response = requests.get(base_url, params={
+    response = session.get(base_url, params={
         "geocode": address,
         "apikey": apikey,
         "format": "json"
-    })
+    }, timeout=timeout)
     response.raise_for_status()
     found_places = response.json()['response']['GeoObjectCollection']['featureMember']
 
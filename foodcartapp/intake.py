@@ -0,0 +1,187 @@
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from coordinates.addresses import get_address_hash
+from coordinates.geocoding import geocode_addresses_in_background
+from coordinates.models import Coordinates
+from .models import Order, OrderIntake, OrderItem
+from .orders import build_order
+from .product_cache import get_cached_products
+from .serializers import OrderSerializer, get_order_products, get_product_ids
+
+
+def enqueue_order(data, idempotency_key=None):
+    # проверка заказа по товарам из кэша процесса и одна вставка в очередь:
+    # несуществующий товар отклоняется сразу, а не обработчиком очереди.
+    # Возвращает запись очереди и False, если такой заказ уже в очереди
+    serializer = OrderSerializer(
+        data=data,
+        context={'products': get_order_products(data)}
+    )
+    serializer.is_valid(raise_exception=True)  # выкинет ValidationError
+
+    validated_data = serializer.validated_data
+    payload = {
+        'firstname': validated_data['customer_first_name'],
+        'lastname': validated_data['customer_last_name'],
+        'phonenumber': str(validated_data['phonenumber']),
+        'address': validated_data['address'],
+        'products': [
+            {
+                'product': product['product'].id,
+                'quantity': product['quantity'],
+            }
+            for product in validated_data['products']
+        ],
+    }
+    try:
+        with transaction.atomic():
+            intake = OrderIntake.objects.create(
+                payload=payload,
+                idempotency_key=idempotency_key,
+            )
+    except IntegrityError:
+        intake = None
+        if idempotency_key:
+            intake = OrderIntake.objects.filter(
+                idempotency_key=idempotency_key
+            ).first()
+        if intake is None:
+            raise
+        return intake, False
+    return intake, True
+
+
+def insert_orders(orders):
+    # Postgres вернёт id всех заказов из одного INSERT,
+    # SQLite в Django 3.2 так не умеет
+    if connection.features.can_return_rows_from_bulk_insert:
+        Order.objects.bulk_create(orders)
+        return
+    for order in orders:
+        order.save(force_insert=True)
+
+
+def save_orders(new_orders):
+    # new_orders - тройки (запись очереди, заказ, позиции). Связывает
+    # записи очереди с заказами и возвращает тройки созданных заказов
+    try:
+        with transaction.atomic():
+            insert_orders([order for _, order, _ in new_orders])
+    except IntegrityError:
+        pass
+    else:
+        for intake, order, _ in new_orders:
+            intake.status = 'DONE'
+            intake.order = order
+        return new_orders
+
+    # заказ с тем же ключом появился уже после проверки ключей пачки:
+    # заказы сохраняются по одному, чтобы не откатывать всю пачку
+    created_orders = []
+    for intake, order, order_items in new_orders:
+        order.pk = None
+        try:
+            with transaction.atomic():
+                order.save(force_insert=True)
+        except IntegrityError:
+            existing_order = None
+            if order.idempotency_key:
+                existing_order = Order.objects.filter(
+                    idempotency_key=order.idempotency_key
+                ).first()
+            if existing_order is None:
+                raise
+            intake.status = 'DONE'
+            intake.order = existing_order
+            continue
+        intake.status = 'DONE'
+        intake.order = order
+        created_orders.append((intake, order, order_items))
+    return created_orders
+
+
+def process_intake_batch(batch_size=None):
+    # переносит пачку заказов из очереди в Order одной транзакцией:
+    # товары, координаты и уже созданные заказы всей пачки читаются разом,
+    # позиции всех заказов вставляются одним запросом.
+    # Параллельные обработчики пропускают строки, заблокированные другими
+    if batch_size is None:
+        batch_size = settings.ORDER_INTAKE_BATCH_SIZE
+    with transaction.atomic():
+        intakes = list(
+            OrderIntake.objects.select_for_update(skip_locked=True)
+            .filter(status='PENDING')
+            .order_by('id')[:batch_size]
+        )
+        if not intakes:
+            return 0
+
+        products = get_cached_products({
+            product_id
+            for intake in intakes
+            for product_id in get_product_ids(intake.payload.get('products'))
+        })
+        coordinates_by_hash = {
+            coordinates.address_hash: coordinates
+            for coordinates in Coordinates.objects.for_addresses(
+                [intake.payload.get('address', '') for intake in intakes]
+            )
+        }
+        # заказ мог быть создан напрямую, до включения очереди
+        existing_order_ids = dict(
+            Order.objects.filter(idempotency_key__in=[
+                intake.idempotency_key
+                for intake in intakes
+                if intake.idempotency_key
+            ]).values_list('idempotency_key', 'id')
+        )
+
+        processed_at = timezone.now()
+        new_orders = []
+        for intake in intakes:
+            intake.processed_at = processed_at
+            if intake.idempotency_key in existing_order_ids:
+                intake.status = 'DONE'
+                intake.order_id = existing_order_ids[intake.idempotency_key]
+                continue
+
+            serializer = OrderSerializer(
+                data=intake.payload,
+                context={'products': products}
+            )
+            if not serializer.is_valid():
+                intake.status = 'FAILED'
+                intake.errors = serializer.errors
+                continue
+
+            address = serializer.validated_data['address']
+            order, order_items = build_order(
+                serializer.validated_data,
+                coordinates_by_hash.get(get_address_hash(address)),
+                intake.idempotency_key,
+            )
+            new_orders.append((intake, order, order_items))
+
+        new_orders = save_orders(new_orders)
+        all_order_items = []
+        for intake, order, order_items in new_orders:
+            for order_item in order_items:
+                order_item.order = order
+            all_order_items.extend(order_items)
+        OrderItem.objects.bulk_create(all_order_items)
+        OrderIntake.objects.bulk_update(
+            intakes,
+            ['status', 'order', 'errors', 'processed_at']
+        )
+
+        unlocated_addresses = [
+            order.address for _, order, _ in new_orders
+            if not order.coordinates
+        ]
+        if unlocated_addresses and settings.GEOCODE_ON_ORDER_CREATE:
+            transaction.on_commit(
+                lambda: geocode_addresses_in_background(unlocated_addresses)
+            )
+    return len(intakes)
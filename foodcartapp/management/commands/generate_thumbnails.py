@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.cache_versions import bump_version
+from foodcartapp.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры картинок товаров'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'product_ids',
+            nargs='*',
+            type=int,
+            help='id товаров, по умолчанию все товары',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='пересоздать и уже готовые миниатюры',
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='')
+        if options['product_ids']:
+            products = products.filter(id__in=options['product_ids'])
+
+        updated = 0
+        for product in products.iterator():
+            up_to_date = product.thumbnails.get('source') == product.image.name
+            if up_to_date and not options['force']:
+                continue
+            try:
+                product.update_thumbnails()
+            except (OSError, ValueError) as error:
+                self.stderr.write(f'Товар {product.pk}: {error}')
+                continue
+            updated += 1
+
+        if updated:
+            bump_version('catalog')
+        self.stdout.write(f'Обновлены миниатюры товаров: {updated}')
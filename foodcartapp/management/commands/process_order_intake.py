@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from foodcartapp.intake import process_intake_batch
+
+
+class Command(BaseCommand):
+    help = 'Переносит заказы из очереди приёма в заказы пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.ORDER_INTAKE_BATCH_SIZE,
+            help='сколько заказов переносить за одну транзакцию',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=settings.ORDER_INTAKE_POLL_INTERVAL,
+            help='пауза в секундах, когда очередь пуста',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='разобрать очередь и завершиться',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            processed = process_intake_batch(options['batch_size'])
+            if processed:
+                self.stdout.write(f'Обработано заказов: {processed}')
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
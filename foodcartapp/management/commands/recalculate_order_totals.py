@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сохранённую стоимость заказов по их позициям'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'order_ids',
+            nargs='*',
+            type=int,
+            help='id заказов, по умолчанию все заказы',
+        )
+
+    def handle(self, *args, **options):
+        orders = Order.objects.all()
+        if options['order_ids']:
+            orders = orders.filter(id__in=options['order_ids'])
+        updated = orders.recalculate_total_price()
+        self.stdout.write(f'Пересчитано заказов: {updated}')
@@ -0,0 +1,116 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+# метрики текущего запроса, None вне запроса и в фоновых потоках
+current_metrics = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.wall_time = 0
+        self.db_time = 0
+        self.db_queries = 0
+        self.external_time = 0
+        self.external_calls = 0
+
+    def finish(self):
+        self.wall_time = time.perf_counter() - self.started_at
+
+    def as_dict(self):
+        return {
+            'wall_ms': round(self.wall_time * 1000, 2),
+            'db_ms': round(self.db_time * 1000, 2),
+            'db_queries': self.db_queries,
+            'external_ms': round(self.external_time * 1000, 2),
+            'external_calls': self.external_calls,
+        }
+
+
+def record_query(execute, sql, params, many, context):
+    # подключается через connection.execute_wrapper на время запроса
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started_at = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - started_at
+        metrics.db_queries += 1
+
+
+@contextmanager
+def track_external_call():
+    # время ожидания внешнего сервиса (геокодера) внутри запроса
+    metrics = current_metrics.get()
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        if metrics is not None:
+            metrics.external_time += time.perf_counter() - started_at
+            metrics.external_calls += 1
+
+
+class MetricsRegistry:
+    # сводка по view в памяти процесса, у каждого воркера своя
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def add(self, view_name, metrics, over_budget):
+        with self.lock:
+            stats = self.views.setdefault(view_name, {
+                'requests': 0,
+                'wall_ms_total': 0,
+                'wall_ms_max': 0,
+                'db_ms_total': 0,
+                'db_queries_total': 0,
+                'db_queries_max': 0,
+                'external_ms_total': 0,
+                'external_calls_total': 0,
+                'over_budget': 0,
+            })
+            values = metrics.as_dict()
+            stats['requests'] += 1
+            stats['wall_ms_total'] += values['wall_ms']
+            stats['wall_ms_max'] = max(stats['wall_ms_max'], values['wall_ms'])
+            stats['db_ms_total'] += values['db_ms']
+            stats['db_queries_total'] += values['db_queries']
+            stats['db_queries_max'] = max(
+                stats['db_queries_max'],
+                values['db_queries']
+            )
+            stats['external_ms_total'] += values['external_ms']
+            stats['external_calls_total'] += values['external_calls']
+            stats['over_budget'] += over_budget
+
+    def snapshot(self):
+        with self.lock:
+            views = {
+                view_name: dict(stats)
+                for view_name, stats in self.views.items()
+            }
+        for stats in views.values():
+            for key in ['wall_ms_total', 'db_ms_total', 'external_ms_total']:
+                stats[key] = round(stats[key], 2)
+            requests = stats['requests']
+            stats['wall_ms_mean'] = round(stats['wall_ms_total'] / requests, 2)
+            stats['db_ms_mean'] = round(stats['db_ms_total'] / requests, 2)
+            stats['db_queries_mean'] = round(
+                stats['db_queries_total'] / requests,
+                2
+            )
+        return views
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+
+
+registry = MetricsRegistry()
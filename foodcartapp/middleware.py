@@ -0,0 +1,120 @@
+import json
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import decorator_from_middleware
+from django.utils.regex_helper import _lazy_re_compile
+
+from .metrics import current_metrics, record_query, registry, RequestMetrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+logger = logging.getLogger(__name__)
+
+re_accepts_brotli = _lazy_re_compile(r'\bbr\b')
+
+# максимальное качество 11 слишком медленное для динамических ответов
+BROTLI_QUALITY = 5
+
+
+class CompressionMiddleware(GZipMiddleware):
+    # brotli, если установлен и поддерживается клиентом, иначе gzip
+    def process_response(self, request, response):
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if not (brotli and re_accepts_brotli.search(accept_encoding)) \
+                or response.streaming \
+                or len(response.content) < 200 \
+                or response.has_header('Content-Encoding'):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        compressed_content = brotli.compress(
+            response.content,
+            quality=BROTLI_QUALITY
+        )
+        if len(compressed_content) >= len(response.content):
+            return response
+        response.content = compressed_content
+        response.headers['Content-Length'] = str(len(response.content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
+
+
+compress_page = decorator_from_middleware(CompressionMiddleware)
+
+
+class MetricsMiddleware:
+    # время ответа, время и число SQL-запросов и время обращений
+    # к внешним сервисам по каждому view.
+    # Для потоковых ответов учитывается только время до первого байта
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(record_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        metrics.finish()
+
+        resolver_match = getattr(request, 'resolver_match', None)
+        if resolver_match:
+            self.report(resolver_match.view_name, request, metrics)
+        response.headers['Server-Timing'] = ', '.join([
+            f'db;dur={metrics.db_time * 1000:.1f}',
+            f'ext;dur={metrics.external_time * 1000:.1f}',
+            f'total;dur={metrics.wall_time * 1000:.1f}',
+        ])
+        return response
+
+    def report(self, view_name, request, metrics):
+        values = metrics.as_dict()
+        query_budget = settings.METRICS_QUERY_BUDGETS.get(view_name)
+        time_budget = settings.METRICS_TIME_BUDGETS.get(view_name)
+        over_budget = (
+            query_budget is not None and values['db_queries'] > query_budget
+        ) or (
+            time_budget is not None and values['wall_ms'] > time_budget
+        )
+        registry.add(view_name, metrics, over_budget)
+
+        if over_budget:
+            logger.warning(
+                'View %s превысил бюджет: %s запросов к БД (бюджет %s), '
+                '%s мс (бюджет %s)',
+                view_name,
+                values['db_queries'],
+                query_budget,
+                values['wall_ms'],
+                time_budget,
+            )
+        if settings.METRICS_LOG_REQUESTS:
+            logger.info(json.dumps({
+                'view': view_name,
+                'method': request.method,
+                'path': request.path,
+                **values,
+            }))
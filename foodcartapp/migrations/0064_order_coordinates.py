@@ -0,0 +1,20 @@
+# Generated by Django 3.2 on 2026-10-18 10:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coordinates', '0007_remove_coordinates_coordinates'),
+        ('foodcartapp', '0063_remove_restaurant_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='coordinates',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to='coordinates.coordinates', verbose_name='координаты'),
+        ),
+    ]
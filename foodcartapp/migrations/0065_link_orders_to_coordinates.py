@@ -0,0 +1,29 @@
+# Generated by Django 3.2 on 2026-10-18 10:44
+
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def link_orders_to_coordinates(apps, schema_editor):
+    Order = apps.get_model('foodcartapp', 'Order')
+    Coordinates = apps.get_model('coordinates', 'Coordinates')
+
+    coordinates = Coordinates.objects.filter(
+        address=OuterRef('address')
+    ).values('pk')[:1]
+    Order.objects.filter(coordinates__isnull=True) \
+        .update(coordinates=Subquery(coordinates))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0064_order_coordinates'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            link_orders_to_coordinates,
+            migrations.RunPython.noop
+        ),
+    ]
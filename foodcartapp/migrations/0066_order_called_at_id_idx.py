@@ -0,0 +1,17 @@
+# Generated by Django 3.2 on 2026-10-18 10:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0065_link_orders_to_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['called_at', 'id'], name='order_called_at_id_idx'),
+        ),
+    ]
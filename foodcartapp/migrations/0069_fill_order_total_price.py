@@ -0,0 +1,29 @@
+# Generated by Django 3.2 on 2026-10-18 10:50
+
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_order_total_price(apps, schema_editor):
+    Order = apps.get_model('foodcartapp', 'Order')
+    OrderItem = apps.get_model('foodcartapp', 'OrderItem')
+
+    items_price = OrderItem.objects.filter(order=OuterRef('pk')) \
+        .values('order').annotate(total=Sum('price')).values('total')
+    Order.objects.update(
+        total_price=Coalesce(Subquery(items_price), Decimal(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0068_order_total_price'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_order_total_price, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.2 on 2026-10-18 12:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0072_order_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderIntake',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.UUIDField(default=uuid.uuid4, editable=False, unique=True, verbose_name='токен')),
+                ('status', models.CharField(choices=[('PENDING', 'В очереди'), ('DONE', 'Принят'), ('FAILED', 'Отклонён')], db_index=True, default='PENDING', max_length=20, verbose_name='Статус')),
+                ('payload', models.JSONField(verbose_name='данные заказа')),
+                ('idempotency_key', models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True, verbose_name='ключ идемпотентности')),
+                ('errors', models.JSONField(blank=True, default=dict, verbose_name='ошибки')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='время приёма')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='время обработки')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='intakes', to='foodcartapp.order', verbose_name='заказ')),
+            ],
+            options={
+                'verbose_name': 'заказ в очереди',
+                'verbose_name_plural': 'очередь заказов',
+            },
+        ),
+    ]
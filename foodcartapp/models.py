@@ -1,9 +1,16 @@
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from phonenumber_field.modelfields import PhoneNumberField
-from django.db.models import Sum, F, OuterRef, Subquery
+from django.db.models import Exists, Sum, F, Q, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from decimal import Decimal
+import uuid
+from collections import defaultdict
 from django.utils import timezone
 from coordinates.models import Coordinates
+from .thumbnails import (
+    THUMBNAIL_FORMATS, create_thumbnails, delete_thumbnails
+)
 
 
 class Restaurant(models.Model):
@@ -40,14 +47,21 @@ class Restaurant(models.Model):
         return self.name
 
 
+def get_available_menu_items_subquery():
+    return Exists(RestaurantMenuItem.objects.filter(
+        product=OuterRef('pk'),
+        availability=True,
+    ))
+
+
 class ProductQuerySet(models.QuerySet):
     def available(self):
-        products = (
-            RestaurantMenuItem.objects
-            .filter(availability=True)
-            .values_list('product')
-        )
-        return self.filter(pk__in=products)
+        # EXISTS по индексу (product, availability) останавливается
+        # на первом ресторане, а не собирает IN-список с повторами
+        return self.filter(get_available_menu_items_subquery())
+
+    def with_availability(self):
+        return self.annotate(is_available=get_available_menu_items_subquery())
 
 
 class ProductCategory(models.Model):
@@ -86,6 +100,13 @@ class Product(models.Model):
     image = models.ImageField(
         'картинка'
     )
+    # имена файлов миниатюр, см. thumbnails.create_thumbnails
+    thumbnails = models.JSONField(
+        'миниатюры',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     special_status = models.BooleanField(
         'спец.предложение',
         default=False,
@@ -105,6 +126,71 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+    def get_thumbnail_sizes(self):
+        # миниатюры от прежней картинки не отдаются
+        if not self.image or self.thumbnails.get('source') != self.image.name:
+            return []
+        return self.thumbnails['sizes']
+
+    def get_thumbnail_urls(self):
+        storage = self.image.storage
+        return [
+            {
+                'width': size['width'],
+                **{
+                    image_format: storage.url(size[image_format])
+                    for image_format in THUMBNAIL_FORMATS
+                },
+            }
+            for size in self.get_thumbnail_sizes()
+        ]
+
+    def get_thumbnail_url(self, width, image_format='jpeg'):
+        # самая маленькая миниатюра не уже width, иначе оригинал
+        for size in self.get_thumbnail_sizes():
+            if size['width'] >= width:
+                return self.image.storage.url(size[image_format])
+        return self.image.url
+
+    def get_preview_url(self):
+        return self.get_thumbnail_url(100)
+
+    def update_thumbnails(self):
+        if self.thumbnails:
+            delete_thumbnails(self.thumbnails, self.image.storage)
+        self.thumbnails = create_thumbnails(self.image) if self.image else {}
+        Product.objects.filter(pk=self.pk).update(thumbnails=self.thumbnails)
+
+
+class RestaurantMenuItemQuerySet(models.QuerySet):
+    def available(self):
+        return self.filter(availability=True)
+
+    def get_restaurants_by_product(self):
+        restaurants_by_product = defaultdict(set)
+        for product_id, restaurant_id in self.values_list(
+            'product_id', 'restaurant_id'
+        ):
+            restaurants_by_product[product_id].add(restaurant_id)
+        return {
+            product_id: frozenset(restaurant_ids)
+            for product_id, restaurant_ids in restaurants_by_product.items()
+        }
+
+    def get_availability_masks(self, restaurant_ids):
+        # бит i маски товара взведён, если товар доступен
+        # в ресторане restaurant_ids[i]
+        bits = {
+            restaurant_id: 1 << position
+            for position, restaurant_id in enumerate(restaurant_ids)
+        }
+        masks = defaultdict(int)
+        for product_id, restaurant_id in self.values_list(
+            'product_id', 'restaurant_id'
+        ):
+            masks[product_id] |= bits.get(restaurant_id, 0)
+        return dict(masks)
+
 
 class RestaurantMenuItem(models.Model):
     restaurant = models.ForeignKey(
@@ -125,12 +211,20 @@ class RestaurantMenuItem(models.Model):
         db_index=True
     )
 
+    objects = RestaurantMenuItemQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'пункт меню ресторана'
         verbose_name_plural = 'пункты меню ресторана'
         unique_together = [
             ['restaurant', 'product']
         ]
+        indexes = [
+            models.Index(
+                fields=['product', 'availability'],
+                name='menu_item_product_avail_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.restaurant.name} - {self.product.name}"
@@ -138,30 +232,57 @@ class RestaurantMenuItem(models.Model):
 
 class OrderQuerySet(models.QuerySet):
     def annotate_with_price(self):
-        return self.annotate(
-            order_price=Sum(F('items__product__price') * F('items__quantity'))
+        return self.annotate(order_price=F('total_price'))
+
+    def recalculate_total_price(self):
+        items_price = OrderItem.objects.filter(order=OuterRef('pk')) \
+            .values('order').annotate(total=Sum('price')).values('total')
+        return self.update(
+            total_price=Coalesce(Subquery(items_price), Decimal(0)),
+            updated_at=timezone.now(),
         )
 
     def annotate_with_coords(self):
-        subquery_long = Subquery(
-            Coordinates.objects.filter(
-                address=OuterRef('address')
-            ).values('long')
-        )
-        subquery_lat = Subquery(
-            Coordinates.objects.filter(
-                address=OuterRef('address')
-            ).values('lat')
+        return self.annotate(
+            long=F('coordinates__long'),
+            lat=F('coordinates__lat'),
         )
 
-        orders_with_coord = self.annotate(long=subquery_long) \
-            .annotate(lat=subquery_lat)
-        return orders_with_coord
-
     def get_noprocessed_orders(self):
         orders = self.exclude(status='CLOSED')
         return orders
 
+    def order_by_call(self):
+        # новые заказы без звонка идут первыми в любой СУБД
+        return self.order_by(F('called_at').desc(nulls_first=True), '-id')
+
+    def after_cursor(self, called_at, order_id):
+        if called_at is None:
+            return self.filter(
+                Q(called_at__isnull=True, id__lt=order_id)
+                | Q(called_at__isnull=False)
+            )
+        return self.filter(
+            Q(called_at__lt=called_at)
+            | Q(called_at=called_at, id__lt=order_id)
+        )
+
+    def changed_after(self, updated_at, order_id):
+        return self.filter(
+            Q(updated_at__gt=updated_at)
+            | Q(updated_at=updated_at, id__gt=order_id)
+        ).order_by('updated_at', 'id')
+
+    def changed_shortly_before(self, updated_at, overlap):
+        # updated_at ставится до коммита, поэтому заказ может появиться
+        # в БД уже после того, как курсор прошёл его updated_at.
+        # Окно отсчитывается от текущего времени, а не от курсора:
+        # без новых изменений через overlap повторы прекращаются
+        return self.filter(
+            updated_at__gte=timezone.now() - overlap,
+            updated_at__lte=updated_at,
+        ).order_by('-updated_at')
+
 
 class Order(models.Model):
     STATUS_CHOICES = [
@@ -226,6 +347,11 @@ class Order(models.Model):
         verbose_name='время доставки',
         db_index=True
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='время изменения',
+        db_index=True
+    )
     restaurant = models.ForeignKey(
         Restaurant,
         blank=True,
@@ -234,11 +360,42 @@ class Order(models.Model):
         verbose_name='ресторан',
         related_name='orders'
     )
+    total_price = models.DecimalField(
+        verbose_name='стоимость заказа',
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        validators=[MinValueValidator(0)],
+        editable=False,
+    )
+    coordinates = models.ForeignKey(
+        Coordinates,
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        verbose_name='координаты',
+        related_name='orders'
+    )
+    # защищает от дублей при повторной отправке заказа
+    idempotency_key = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        unique=True,
+        editable=False,
+        verbose_name='ключ идемпотентности',
+    )
     objects = OrderQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'заказ'
         verbose_name_plural = 'заказы'
+        indexes = [
+            models.Index(
+                fields=['called_at', 'id'],
+                name='order_called_at_id_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.id} {self.customer_first_name} {self.address}"
@@ -279,3 +436,67 @@ class OrderItem(models.Model):
             {self.order.customer_first_name} \
             {self.order.customer_last_name} \
             {self.order.address[:50]}"
+
+
+class OrderIntake(models.Model):
+    # заказ, принятый в очередь и ещё не записанный в Order,
+    # его разбирает команда process_order_intake
+    STATUS_CHOICES = [
+        ('PENDING', 'В очереди'),
+        ('DONE', 'Принят'),
+        ('FAILED', 'Отклонён'),
+    ]
+    token = models.UUIDField(
+        default=uuid.uuid4,
+        unique=True,
+        editable=False,
+        verbose_name='токен'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='PENDING',
+        verbose_name='Статус',
+        db_index=True
+    )
+    payload = models.JSONField(
+        verbose_name='данные заказа'
+    )
+    idempotency_key = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        unique=True,
+        editable=False,
+        verbose_name='ключ идемпотентности',
+    )
+    order = models.ForeignKey(
+        Order,
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        verbose_name='заказ',
+        related_name='intakes'
+    )
+    errors = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='ошибки'
+    )
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='время приёма',
+        db_index=True
+    )
+    processed_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='время обработки'
+    )
+
+    class Meta:
+        verbose_name = 'заказ в очереди'
+        verbose_name_plural = 'очередь заказов'
+
+    def __str__(self):
+        return f"{self.token} {self.status}"
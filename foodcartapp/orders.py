@@ -0,0 +1,24 @@
+from .models import Order, OrderItem
+
+
+def build_order(validated_data, coordinates=None, idempotency_key=None):
+    # заказ и его позиции по данным OrderSerializer, ещё не сохранённые.
+    # Цена позиции берётся из текущей цены товара
+    order_items = [
+        OrderItem(
+            product=product['product'],
+            quantity=product['quantity'],
+            price=product['quantity'] * product['product'].price
+        )
+        for product in validated_data['products']
+    ]
+    order = Order(
+        customer_first_name=validated_data['customer_first_name'],
+        customer_last_name=validated_data['customer_last_name'],
+        address=validated_data['address'],
+        phonenumber=validated_data['phonenumber'],
+        coordinates=coordinates,
+        total_price=sum(order_item.price for order_item in order_items),
+        idempotency_key=idempotency_key,
+    )
+    return order, order_items
@@ -0,0 +1,45 @@
+from star_burger.replicas import primary_reads
+
+from .cache_versions import get_version
+from .models import Product
+
+
+_products_cache = {
+    'version': None,
+    'products': {},
+}
+
+
+def get_products_cache_version():
+    # цена и название меняются вместе с версией 'products',
+    # доступность - с версией 'menu'
+    return get_version('products'), get_version('menu')
+
+
+def fetch_products(product_ids):
+    with primary_reads():
+        return Product.objects.only('id', 'name', 'price') \
+            .with_availability() \
+            .in_bulk(product_ids)
+
+
+def get_cached_products(product_ids):
+    # товары для проверки заказов: только id, название, цена и is_available.
+    # Хранятся в памяти процесса до смены версий, недостающие достаются
+    # одним запросом. Возвращает словарь id -> Product без несуществующих id.
+    # С кэшем в памяти процесса чужие процессы увидят новую цену не позже
+    # чем через CACHE_VERSION_TIMEOUT, как и каталог с индексом ресторанов
+    version = get_products_cache_version()
+    if _products_cache['version'] != version:
+        _products_cache['products'] = {}
+        _products_cache['version'] = version
+    products = _products_cache['products']
+
+    missing_ids = set(product_ids) - products.keys()
+    if missing_ids:
+        products.update(fetch_products(missing_ids))
+    return {
+        product_id: products[product_id]
+        for product_id in product_ids
+        if product_id in products
+    }
@@ -0,0 +1,45 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+PRETTY_FLAGS = {'1', 'true', 'yes'}
+
+
+def is_pretty_requested(request):
+    return request.GET.get('pretty', '').lower() in PRETTY_FLAGS
+
+
+def dump_json(data, pretty=False):
+    if pretty:
+        return json.dumps(
+            data,
+            cls=DjangoJSONEncoder,
+            ensure_ascii=False,
+            indent=4,
+        ).encode()
+    if orjson:
+        return orjson.dumps(
+            data,
+            default=DjangoJSONEncoder().default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME,
+        )
+    return json.dumps(
+        data,
+        cls=DjangoJSONEncoder,
+        ensure_ascii=False,
+        separators=(',', ':'),
+    ).encode()
+
+
+def json_response(request, data):
+    return HttpResponse(
+        dump_json(data, pretty=is_pretty_requested(request)),
+        content_type='application/json',
+    )
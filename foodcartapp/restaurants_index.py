@@ -0,0 +1,36 @@
+from coordinates.spatial import GeoIndex
+from star_burger.replicas import primary_reads
+
+from .cache_versions import get_version
+from .models import Restaurant
+
+
+_restaurants_index = {
+    'version': None,
+    'index': None,
+}
+
+
+def get_restaurants_index():
+    # индекс строится один раз на процесс и пересобирается,
+    # когда сигналы меняют версию 'restaurants'
+    version = get_version('restaurants')
+    if _restaurants_index['version'] != version:
+        with primary_reads():
+            _restaurants_index['index'] = GeoIndex(
+                Restaurant.objects.values_list('id', 'lat', 'long')
+            )
+        _restaurants_index['version'] = version
+    return _restaurants_index['index']
+
+
+def find_nearest_restaurants(lat, long, limit, restaurant_ids=None):
+    return get_restaurants_index().nearest(
+        lat, long, k=limit, keys=restaurant_ids
+    )
+
+
+def find_restaurants_within(lat, long, radius_km, restaurant_ids=None):
+    return get_restaurants_index().within(
+        lat, long, radius_km, keys=restaurant_ids
+    )
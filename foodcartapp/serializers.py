@@ -0,0 +1,84 @@
+from rest_framework import serializers
+
+from .models import Order, OrderItem, Product
+from .product_cache import get_cached_products
+
+
+def parse_product_id(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+
+
+def get_product_ids(products_fields):
+    if not isinstance(products_fields, list):
+        return []
+
+    product_ids = [
+        parse_product_id(product_fields.get('product'))
+        for product_fields in products_fields
+        if isinstance(product_fields, dict)
+    ]
+    return [
+        product_id for product_id in product_ids if product_id is not None
+    ]
+
+
+def get_order_products(data):
+    # товары заказа для context={'products': ...} OrderSerializer:
+    # из кэша процесса, недостающие - одним запросом,
+    # а не отдельным запросом на каждую позицию
+    if not hasattr(data, 'get'):
+        return {}
+    return get_cached_products(get_product_ids(data.get('products')))
+
+
+class ProductPrimaryKeyField(serializers.PrimaryKeyRelatedField):
+
+    def to_internal_value(self, data):
+        # товары заказа переданы в context разом, отсутствующий
+        # среди них id не существует и второй раз не запрашивается
+        products = self.context.get('products')
+        product_id = parse_product_id(data)
+        if products is None or product_id is None:
+            return super().to_internal_value(data)
+        if product_id not in products:
+            self.fail('does_not_exist', pk_value=data)
+        return products[product_id]
+
+
+class OrderItemSerializer(serializers.ModelSerializer):
+    product = ProductPrimaryKeyField(queryset=Product.objects.all())
+
+    class Meta:
+        model = OrderItem
+        fields = ['product', 'quantity']
+
+
+class OrderSerializer(serializers.ModelSerializer):
+
+    products = OrderItemSerializer(many=True, allow_empty=False)
+    firstname = serializers.CharField(source='customer_first_name')
+    lastname = serializers.CharField(source='customer_last_name')
+
+    class Meta:
+        model = Order
+        fields = [
+            'firstname', 'lastname', 'phonenumber',
+            'address', 'products'
+        ]
+
+
+class MenuAvailabilitySerializer(serializers.Serializer):
+    restaurants = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        required=False,
+    )
+    products = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        required=False,
+    )
+    availability = serializers.BooleanField()
@@ -0,0 +1,54 @@
+import logging
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache_versions import bump_version
+from .models import Product, ProductCategory, Restaurant, RestaurantMenuItem
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def invalidate_catalog(sender, **kwargs):
+    bump_version('catalog')
+
+
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def invalidate_menu(sender, **kwargs):
+    bump_version('menu')
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_products_cache(sender, **kwargs):
+    bump_version('products')
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def invalidate_restaurants_index(sender, **kwargs):
+    bump_version('restaurants')
+
+
+@receiver(post_save, sender=Product)
+def update_product_thumbnails(sender, instance, raw=False, **kwargs):
+    if raw or not instance.image:
+        return
+    if instance.thumbnails.get('source') == instance.image.name:
+        return
+    try:
+        instance.update_thumbnails()
+    except (OSError, ValueError):
+        logger.warning(
+            'Не удалось создать миниатюры для товара %s', instance.pk,
+            exc_info=True,
+        )
+        return
+    bump_version('catalog')
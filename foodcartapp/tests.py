@@ -0,0 +1,431 @@
+import itertools
+import random
+
+from types import SimpleNamespace
+
+import numpy as np
+from django.contrib.admin import site
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .admin import OrderAdmin
+from .assignment import UNAVAILABLE, solve_assignment
+from .intake import process_intake_batch, save_orders
+from .models import (
+    Order, OrderIntake, OrderItem, Product, ProductCategory, Restaurant,
+    RestaurantMenuItem
+)
+from .orders import build_order
+from .product_cache import get_cached_products
+
+
+def get_total_cost(costs, loads, load_penalty, assignment):
+    loads = list(loads)
+    total_cost = 0
+    for row, column in enumerate(assignment):
+        if column < 0:
+            continue
+        total_cost += costs[row, column] + load_penalty * loads[column]
+        loads[column] += 1
+    return total_cost
+
+
+class SolveAssignmentTest(SimpleTestCase):
+
+    def test_nearest_without_load_penalty(self):
+        costs = np.array([
+            [1.0, 5.0, 3.0],
+            [4.0, 2.0, 6.0],
+            [7.0, 8.0, 0.5],
+        ])
+        assignment = solve_assignment(costs, [0, 0, 0], 0)
+        self.assertEqual(list(assignment), [0, 1, 2])
+
+    def test_unavailable_restaurants(self):
+        costs = np.array([
+            [UNAVAILABLE, 2.0],
+            [UNAVAILABLE, UNAVAILABLE],
+            [1.0, UNAVAILABLE],
+        ])
+        assignment = solve_assignment(costs, [0, 0], 1)
+        self.assertEqual(list(assignment), [1, -1, 0])
+
+    def test_load_penalty_spreads_orders(self):
+        # обоим заказам ближе ресторан 0, но он уже загружен
+        costs = np.array([
+            [1.0, 2.0],
+            [1.0, 2.0],
+        ])
+        assignment = solve_assignment(costs, [3, 0], 1)
+        self.assertEqual(list(assignment), [1, 1])
+
+    def test_empty(self):
+        assignment = solve_assignment(np.zeros((0, 3)), [0, 0, 0], 1)
+        self.assertEqual(len(assignment), 0)
+        assignment = solve_assignment(np.zeros((2, 0)), [], 1)
+        self.assertEqual(list(assignment), [-1, -1])
+
+    def test_close_to_optimum_on_small_instances(self):
+        rng = random.Random(42)
+        for _ in range(30):
+            orders_count, restaurants_count = 6, 3
+            costs = np.array([
+                [
+                    UNAVAILABLE if rng.random() < 0.2 else rng.uniform(0, 10)
+                    for _ in range(restaurants_count)
+                ]
+                for _ in range(orders_count)
+            ])
+            loads = [rng.randint(0, 3) for _ in range(restaurants_count)]
+
+            assignment = solve_assignment(costs, loads, 2)
+            greedy = solve_assignment(costs, loads, 2, max_passes=0)
+            optimum = min(
+                get_total_cost(costs, loads, 2, candidate)
+                for candidate in itertools.product(
+                    range(restaurants_count), repeat=orders_count
+                )
+            )
+
+            for row, column in enumerate(assignment):
+                if (costs[row] < UNAVAILABLE).any():
+                    self.assertLess(costs[row, column], UNAVAILABLE)
+                else:
+                    self.assertEqual(column, -1)
+            cost = get_total_cost(costs, loads, 2, assignment)
+            self.assertLessEqual(
+                cost,
+                get_total_cost(costs, loads, 2, greedy) + 1e-9
+            )
+            if cost < UNAVAILABLE:
+                self.assertLessEqual(cost, optimum * 1.1 + 1e-9)
+
+
+def create_products(count):
+    Product.objects.bulk_create([
+        Product(name=f'Бургер {number}', price=100 + number)
+        for number in range(count)
+    ])
+    return list(Product.objects.order_by('pk'))
+
+
+def get_order_fields(products):
+    return {
+        'firstname': 'Иван',
+        'lastname': 'Петров',
+        'phonenumber': '+79001234567',
+        'address': 'Москва, ул. Тверская, 1',
+        'products': [
+            {'product': product.id, 'quantity': 2} for product in products
+        ],
+    }
+
+
+def post_order(client, order_fields, idempotency_key):
+    return client.post(
+        reverse('foodcartapp:register_order'),
+        order_fields,
+        content_type='application/json',
+        HTTP_IDEMPOTENCY_KEY=idempotency_key,
+    )
+
+
+@override_settings(GEOCODE_ON_ORDER_CREATE=False)
+class RegisterOrderReplayTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = create_products(2)
+
+    def setUp(self):
+        cache.clear()
+        self.order_fields = get_order_fields(self.products)
+
+    def test_replay_from_cache(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first_response = post_order(self.client, self.order_fields, 'a')
+        self.assertEqual(first_response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', first_response)
+
+        with CaptureQueriesContext(connection) as queries:
+            second_response = post_order(self.client, self.order_fields, 'a')
+        self.assertFalse([
+            query for query in queries
+            if 'SAVEPOINT' not in query['sql']
+        ])
+        self.assertEqual(second_response.status_code, 201)
+        self.assertEqual(second_response['Idempotent-Replayed'], 'true')
+        self.assertEqual(second_response.json(), first_response.json())
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_replay_of_uncached_order(self):
+        # ответ первого запроса ещё не в кэше: повтор упирается
+        # в уникальный ключ заказа
+        post_order(self.client, self.order_fields, 'a')
+
+        response = post_order(self.client, self.order_fields, 'a')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_different_keys_create_orders(self):
+        post_order(self.client, self.order_fields, 'a')
+        response = post_order(self.client, self.order_fields, 'b')
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Order.objects.count(), 2)
+
+
+@override_settings(ORDER_INTAKE_QUEUE=True, GEOCODE_ON_ORDER_CREATE=False)
+class OrderIntakeTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = create_products(2)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_order_is_queued_and_processed(self):
+        response = post_order(
+            self.client, get_order_fields(self.products), 'first'
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], 'PENDING')
+        self.assertFalse(Order.objects.exists())
+
+        self.assertEqual(process_intake_batch(), 1)
+
+        status = self.client.get(response.json()['status_url']).json()
+        self.assertEqual(status['status'], 'DONE')
+        order = Order.objects.get(pk=status['order'])
+        self.assertEqual(order.items.count(), 2)
+        self.assertEqual(order.total_price, 2 * 100 + 2 * 101)
+
+    def test_repeated_order_is_queued_once(self):
+        order_fields = get_order_fields(self.products)
+        first_response = post_order(self.client, order_fields, 'first')
+        second_response = post_order(self.client, order_fields, 'first')
+
+        self.assertEqual(second_response.status_code, 202)
+        self.assertEqual(second_response['Idempotent-Replayed'], 'true')
+        self.assertEqual(
+            first_response.json()['token'],
+            second_response.json()['token']
+        )
+        self.assertEqual(OrderIntake.objects.count(), 1)
+
+    def test_unknown_product_is_rejected(self):
+        order_fields = get_order_fields(self.products)
+        order_fields['products'].append({'product': 99999, 'quantity': 1})
+
+        response = post_order(self.client, order_fields, 'first')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('products', response.json())
+        self.assertFalse(OrderIntake.objects.exists())
+
+    def test_deleted_product_fails_intake(self):
+        response = post_order(
+            self.client, get_order_fields(self.products), 'first'
+        )
+        Product.objects.filter(pk=self.products[0].pk).delete()
+        cache.clear()
+
+        process_intake_batch()
+
+        status = self.client.get(response.json()['status_url']).json()
+        self.assertEqual(status['status'], 'FAILED')
+        self.assertIn('products', status['errors'])
+        self.assertFalse(Order.objects.exists())
+
+    def test_unknown_token(self):
+        response = self.client.get(reverse(
+            'foodcartapp:order_intake_status',
+            args=['00000000-0000-0000-0000-000000000000']
+        ))
+        self.assertEqual(response.status_code, 404)
+
+    def test_duplicate_key_is_linked_to_existing_order(self):
+        # заказ с тем же ключом создан после того, как пачка
+        # проверила уже существующие ключи
+        validated_data = {
+            'customer_first_name': 'Иван',
+            'customer_last_name': 'Петров',
+            'phonenumber': '+79001234567',
+            'address': 'Москва, ул. Тверская, 1',
+            'products': [{'product': self.products[0], 'quantity': 1}],
+        }
+        existing_order, _ = build_order(validated_data, idempotency_key='a')
+        existing_order.save()
+        new_orders = []
+        for idempotency_key in ['a', 'b']:
+            order, order_items = build_order(
+                validated_data,
+                idempotency_key=idempotency_key
+            )
+            intake = OrderIntake(payload={}, idempotency_key=idempotency_key)
+            new_orders.append((intake, order, order_items))
+
+        created_orders = save_orders(new_orders)
+
+        self.assertEqual(
+            [order.idempotency_key for _, order, _ in created_orders],
+            ['b']
+        )
+        self.assertEqual(new_orders[0][0].order, existing_order)
+        self.assertEqual(new_orders[1][0].status, 'DONE')
+        self.assertEqual(Order.objects.count(), 2)
+
+
+class ProductCacheTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = create_products(3)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_products_are_fetched_once(self):
+        product_ids = [product.id for product in self.products]
+        with self.assertNumQueries(1):
+            products = get_cached_products(product_ids[:2])
+        self.assertEqual(sorted(products), product_ids[:2])
+
+        # из памяти процесса берётся всё, кроме недостающего товара
+        with self.assertNumQueries(1):
+            products = get_cached_products(product_ids)
+        with self.assertNumQueries(0):
+            get_cached_products(product_ids)
+        self.assertEqual(sorted(products), product_ids)
+
+    def test_unknown_products_are_skipped(self):
+        products = get_cached_products([self.products[0].id, 99999])
+        self.assertEqual(list(products), [self.products[0].id])
+
+    def test_price_change_invalidates_cache(self):
+        product = self.products[0]
+        get_cached_products([product.id])
+
+        product.price = 500
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+
+        products = get_cached_products([product.id])
+        self.assertEqual(products[product.id].price, 500)
+
+
+class ProductListCacheTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = ProductCategory.objects.create(name='Бургеры')
+        restaurant = Restaurant.objects.create(
+            name='Star Burger',
+            address='Москва, ул. Тверская, 1',
+            lat=55.757,
+            long=37.611,
+        )
+        # миниатюры уже актуальны, и сохранение их не пересоздаёт
+        cls.product = Product.objects.create(
+            name='Бургер',
+            category=category,
+            price=100,
+            image='burger.jpg',
+            thumbnails={'source': 'burger.jpg', 'sizes': []},
+        )
+        cls.menu_item = RestaurantMenuItem.objects.create(
+            restaurant=restaurant, product=cls.product
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def get_product_list(self, **headers):
+        return self.client.get(
+            reverse('foodcartapp:product_list_api'), **headers
+        )
+
+    def test_not_modified(self):
+        etag = self.get_product_list()['ETag']
+        with self.assertNumQueries(0):
+            response = self.get_product_list(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_product_change_invalidates_catalog(self):
+        etag = self.get_product_list()['ETag']
+
+        self.product.price = 150
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+
+        response = self.get_product_list(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['price'], '150.00')
+
+    def test_menu_change_invalidates_catalog(self):
+        self.assertEqual(len(self.get_product_list().json()), 1)
+
+        self.menu_item.availability = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.menu_item.save()
+
+        self.assertEqual(self.get_product_list().json(), [])
+
+    def test_change_is_visible_after_commit(self):
+        etag = self.get_product_list()['ETag']
+
+        self.product.price = 150
+        with self.captureOnCommitCallbacks(execute=False):
+            self.product.save()
+            response = self.get_product_list(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+@override_settings(GEOCODE_ON_ORDER_CREATE=False)
+class OrderTotalPriceTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = create_products(2)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_register_order_sets_total_price(self):
+        response = post_order(
+            self.client, get_order_fields(self.products), 'a'
+        )
+        order = Order.objects.get()
+        self.assertEqual(order.total_price, 2 * 100 + 2 * 101)
+        self.assertEqual(
+            order.total_price,
+            sum(order_item.price for order_item in order.items.all())
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_admin_recalculates_total_price(self):
+        post_order(self.client, get_order_fields(self.products), 'a')
+        order = Order.objects.get()
+        # позиции правятся инлайнами админки, сумма пересчитывается
+        # после их сохранения
+        OrderItem.objects.filter(product=self.products[0]).delete()
+        OrderItem.objects.filter(product=self.products[1]).update(price=50)
+
+        form = SimpleNamespace(instance=order, save_m2m=lambda: None)
+        OrderAdmin(Order, site).save_related(None, form, [], change=True)
+
+        order.refresh_from_db()
+        self.assertEqual(order.total_price, 50)
+
+    def test_order_without_items_costs_nothing(self):
+        post_order(self.client, get_order_fields(self.products), 'a')
+        order = Order.objects.get()
+        order.items.all().delete()
+
+        Order.objects.filter(pk=order.pk).recalculate_total_price()
+
+        order.refresh_from_db()
+        self.assertEqual(order.total_price, 0)
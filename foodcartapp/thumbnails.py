@@ -0,0 +1,66 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image
+
+# формат Pillow, расширение файла и параметры сохранения
+THUMBNAIL_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 85, 'optimize': True}),
+}
+
+
+def get_thumbnail_name(image_name, width, image_format):
+    _, extension, _ = THUMBNAIL_FORMATS[image_format]
+    root, _ = os.path.splitext(image_name)
+    return f'{root}_{width}w.{extension}'
+
+
+def render_thumbnail(image, width, image_format):
+    pillow_format, _, save_options = THUMBNAIL_FORMATS[image_format]
+    height = round(image.height * width / image.width)
+    thumbnail = image.resize((width, height), Image.LANCZOS)
+    if pillow_format == 'JPEG' and thumbnail.mode != 'RGB':
+        thumbnail = thumbnail.convert('RGB')
+
+    content = BytesIO()
+    thumbnail.save(content, pillow_format, **save_options)
+    return content.getvalue()
+
+
+def create_thumbnails(image_field):
+    # миниатюры лежат рядом с оригиналом, увеличенные копии не создаются.
+    # Возвращает то, что хранится в Product.thumbnails
+    storage = image_field.storage
+    with image_field.open('rb'):
+        image = Image.open(image_field)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+
+    thumbnails = {
+        'source': image_field.name,
+        'sizes': [],
+    }
+    for width in sorted(settings.PRODUCT_THUMBNAIL_WIDTHS):
+        if width >= image.width:
+            break
+        size = {'width': width}
+        for image_format in THUMBNAIL_FORMATS:
+            # занятое имя storage заменит свободным, а не перезапишет
+            # чужой файл: прежние миниатюры товара уже удалены
+            size[image_format] = storage.save(
+                get_thumbnail_name(image_field.name, width, image_format),
+                ContentFile(render_thumbnail(image, width, image_format))
+            )
+        thumbnails['sizes'].append(size)
+    return thumbnails
+
+
+def delete_thumbnails(thumbnails, storage):
+    for size in thumbnails.get('sizes', []):
+        for image_format in THUMBNAIL_FORMATS:
+            if size.get(image_format):
+                storage.delete(size[image_format])
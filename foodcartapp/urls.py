@@ -1,12 +1,23 @@
 from django.urls import path
 
 from .views import product_list_api, banners_list_api, register_order
+from .views import order_intake_status, update_menu_availability
 
 
 app_name = "foodcartapp"
 
 urlpatterns = [
-    path('products/', product_list_api),
-    path('banners/', banners_list_api),
-    path('order/', register_order),
+    path('products/', product_list_api, name='product_list_api'),
+    path('banners/', banners_list_api, name='banners_list_api'),
+    path('order/', register_order, name='register_order'),
+    path(
+        'order/intake/<uuid:token>/',
+        order_intake_status,
+        name='order_intake_status'
+    ),
+    path(
+        'menu/availability/',
+        update_menu_availability,
+        name='update_menu_availability'
+    ),
 ]
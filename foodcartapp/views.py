@@ -1,18 +1,38 @@
 from django.templatetags.static import static
 
-from .models import Order, OrderItem
-from rest_framework.decorators import api_view
+from .models import Order, OrderIntake, OrderItem
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 
 from .models import Product
-from rest_framework import serializers
-from django.http import JsonResponse
-from django.db import transaction
-
-
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.db import IntegrityError, transaction
+from django.conf import settings
+from django.core.cache import cache
+from django.views.decorators.http import etag
+from .availability import set_menu_availability
+from .cache_versions import get_version
+from .intake import enqueue_order
+from .middleware import compress_page
+from .orders import build_order
+from .renderers import dump_json, is_pretty_requested, json_response
+from .serializers import (
+    MenuAvailabilitySerializer, OrderSerializer, get_order_products
+)
+import hashlib
+import time
+from coordinates.geocoding import geocode_addresses_in_background
+from coordinates.models import Coordinates
+from star_burger.replicas import primary_reads
+
+
+@compress_page
 def banners_list_api(request):
     # FIXME move data to db?
-    return JsonResponse([
+    return json_response(request, [
         {
             'title': 'Burger',
             'src': static('burger.jpg'),
@@ -28,81 +48,182 @@ def banners_list_api(request):
             'src': static('tasty.jpg'),
             'text': 'Food is incomplete without a tasty dessert',
         }
-    ], safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
-
-
-def product_list_api(request):
-    products = Product.objects.select_related('category').available()
-
-    dumped_products = []
-    for product in products:
-        dumped_product = {
+    ])
+
+
+def serialize_product(product):
+    return {
+        'id': product.id,
+        'name': product.name,
+        'price': product.price,
+        'special_status': product.special_status,
+        'description': product.description,
+        'category': {
+            'id': product.category.id,
+            'name': product.category.name,
+        },
+        'image': product.image.url,
+        'thumbnails': product.get_thumbnail_urls(),
+        'restaurant': {
             'id': product.id,
             'name': product.name,
-            'price': product.price,
-            'special_status': product.special_status,
-            'description': product.description,
-            'category': {
-                'id': product.category.id,
-                'name': product.category.name,
-            },
-            'image': product.image.url,
-            'restaurant': {
-                'id': product.id,
-                'name': product.name,
-            }
         }
-        dumped_products.append(dumped_product)
-    return JsonResponse(dumped_products, safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
-
+    }
+
+
+def get_catalog(pretty=False):
+    cache_key = ':'.join([
+        'product_list',
+        str(get_version('catalog')),
+        'pretty' if pretty else 'compact',
+    ])
+    catalog = cache.get(cache_key)
+    if catalog is None:
+        with primary_reads():
+            products = Product.objects.select_related('category') \
+                .available()
+            content = dump_json(
+                [serialize_product(product) for product in products],
+                pretty=pretty,
+            )
+        catalog = {
+            'content': content,
+            'etag': hashlib.sha256(content).hexdigest(),
+        }
+        cache.set(cache_key, catalog, settings.CATALOG_CACHE_TIMEOUT)
+    return catalog
 
-class OrderItemSerializer(serializers.ModelSerializer):
 
-    class Meta:
-        model = OrderItem
-        fields = ['product', 'quantity']
+@compress_page
+@etag(lambda request: get_catalog(is_pretty_requested(request))['etag'])
+def product_list_api(request):
+    return HttpResponse(
+        get_catalog(is_pretty_requested(request))['content'],
+        content_type='application/json'
+    )
 
 
-class OrderSerializer(serializers.ModelSerializer):
+def get_idempotency_key(request):
+    # ключ клиента из заголовка Idempotency-Key, без него - хэш тела
+    # запроса в пределах окна ORDER_DEDUP_WINDOW секунд
+    client_key = request.headers.get('Idempotency-Key')
+    if client_key:
+        source = f'client:{client_key}'.encode()
+    elif settings.ORDER_DEDUP_WINDOW:
+        window = int(time.time() // settings.ORDER_DEDUP_WINDOW)
+        source = f'body:{window}:'.encode() + request.body
+    else:
+        return None
+    return hashlib.sha256(source).hexdigest()
 
-    products = OrderItemSerializer(many=True, allow_empty=False)
-    firstname = serializers.CharField(source='customer_first_name')
-    lastname = serializers.CharField(source='customer_last_name')
 
-    class Meta:
-        model = Order
-        fields = [
-            'firstname', 'lastname', 'phonenumber',
-            'address', 'products'
-        ]
+def get_order_response_cache_key(idempotency_key):
+    return f'order_response:{idempotency_key}'
 
 
 @transaction.atomic
 @api_view(["POST"])
 def register_order(request):
-    serializer = OrderSerializer(data=request.data)
+    # повтор уже принятого заказа получает исходный ответ из кэша
+    idempotency_key = get_idempotency_key(request)
+    if idempotency_key:
+        response_data = cache.get(
+            get_order_response_cache_key(idempotency_key)
+        )
+        if response_data is not None:
+            return Response(
+                response_data,
+                status=201,
+                headers={'Idempotent-Replayed': 'true'}
+            )
+
+    if settings.ORDER_INTAKE_QUEUE:
+        return register_order_in_queue(request, idempotency_key)
+
+    serializer = OrderSerializer(
+        data=request.data,
+        context={'products': get_order_products(request.data)}
+    )
     serializer.is_valid(raise_exception=True)  # выкинет ValidationError
 
-    order = Order.objects.create(
-        customer_first_name=serializer.validated_data['customer_first_name'],
-        customer_last_name=serializer.validated_data['customer_last_name'],
-        address=serializer.validated_data['address'],
-        phonenumber=serializer.validated_data['phonenumber']
+    address = serializer.validated_data['address']
+    order, order_items = build_order(
+        serializer.validated_data,
+        Coordinates.objects.for_address(address).first(),
+        idempotency_key,
     )
-    products_fields = serializer.validated_data['products']
-
-    for product in products_fields:
-        OrderItem.objects.create(
-            order=order,
-            product=product['product'],
-            quantity=product['quantity'],
-            price=product['quantity'] * product['product'].price
+    try:
+        with transaction.atomic():
+            order.save(force_insert=True)
+    except IntegrityError:
+        # тот же заказ уже принят параллельным или более ранним запросом
+        if not idempotency_key or not Order.objects.filter(
+            idempotency_key=idempotency_key
+        ).exists():
+            raise
+        return Response(
+            serializer.data,
+            status=201,
+            headers={'Idempotent-Replayed': 'true'}
         )
 
-    return Response(serializer.data, status=201)
+    for order_item in order_items:
+        order_item.order = order
+    OrderItem.objects.bulk_create(order_items)
+
+    if not order.coordinates and settings.GEOCODE_ON_ORDER_CREATE:
+        transaction.on_commit(
+            lambda: geocode_addresses_in_background([order.address])
+        )
+
+    response_data = dict(serializer.data)
+    if idempotency_key:
+        transaction.on_commit(lambda: cache.set(
+            get_order_response_cache_key(idempotency_key),
+            response_data,
+            settings.ORDER_IDEMPOTENCY_TTL
+        ))
+
+    return Response(response_data, status=201)
+
+
+def serialize_intake(intake):
+    return {
+        'token': intake.token,
+        'status': intake.status,
+        'order': intake.order_id,
+        'errors': intake.errors,
+        'status_url': reverse(
+            'foodcartapp:order_intake_status',
+            args=[intake.token]
+        ),
+    }
+
+
+def register_order_in_queue(request, idempotency_key):
+    # заказ только проверяется и встаёт в очередь,
+    # в Order его перенесёт команда process_order_intake
+    intake, created = enqueue_order(request.data, idempotency_key)
+    headers = {} if created else {'Idempotent-Replayed': 'true'}
+    return Response(serialize_intake(intake), status=202, headers=headers)
+
+
+@api_view(["GET"])
+def order_intake_status(request, token):
+    intake = get_object_or_404(OrderIntake, token=token)
+    return Response(serialize_intake(intake))
+
+
+@api_view(["POST"])
+@permission_classes([IsAdminUser])
+def update_menu_availability(request):
+    # без restaurants - во всех ресторанах, без products - все товары
+    serializer = MenuAvailabilitySerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+
+    updated = set_menu_availability(
+        serializer.validated_data['availability'],
+        restaurant_ids=serializer.validated_data.get('restaurants'),
+        product_ids=serializer.validated_data.get('products'),
+    )
+    return Response({'updated': updated})
@@ -1,3 +1,272 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.test import (
+    SimpleTestCase, TestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone as django_timezone
+
+from coordinates.distances import get_distance_matrix
+from foodcartapp.models import Order, Restaurant
+from star_burger.replicas import read_database
+from . import views
+from .views import (
+    format_cursor, get_nearest_restaurant_distances, parse_cursor
+)
+
+
+class CursorTest(SimpleTestCase):
+
+    def test_round_trip(self):
+        moment = datetime(
+            2026, 10, 18, 12, 30, 15, 123456, tzinfo=timezone.utc
+        )
+        self.assertEqual(
+            parse_cursor(format_cursor(moment, 42)),
+            (moment, 42)
+        )
+
+    def test_null_moment(self):
+        self.assertEqual(parse_cursor(format_cursor(None, 7)), (None, 7))
+
+    def test_invalid(self):
+        for cursor in ['', 'abc', '2026-10-18|x', 'not a date|1', '1|2|3']:
+            self.assertIsNone(parse_cursor(cursor), cursor)
+
+
+class AfterCursorTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        called_at = datetime(2026, 10, 18, 12, tzinfo=timezone.utc)
+        for number in range(12):
+            Order.objects.create(
+                address='Москва, ул. Тверская, 1',
+                customer_first_name='Иван',
+                phonenumber='+79001234567',
+                # без звонка, и по несколько заказов на одно время
+                called_at=None if number % 4 == 0
+                else called_at + timedelta(minutes=number // 3),
+            )
+
+    def test_pages_cover_all_orders_once(self):
+        orders = Order.objects.order_by_call()
+        expected_ids = list(orders.values_list('id', flat=True))
+
+        ids = []
+        cursor = None
+        while True:
+            page_orders = orders.after_cursor(*cursor) if cursor else orders
+            page = list(page_orders[:5])
+            ids.extend(order.id for order in page)
+            if len(page) < 5:
+                break
+            cursor = parse_cursor(
+                format_cursor(page[-1].called_at, page[-1].id)
+            )
+        self.assertEqual(ids, expected_ids)
+
+
+class NearestRestaurantDistancesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurants = Restaurant.objects.in_bulk([
+            Restaurant.objects.create(
+                name=f'Ресторан {number}',
+                address='Москва',
+                lat=55.70 + number * 0.02,
+                long=37.55 + number * 0.03,
+            ).id
+            for number in range(6)
+        ])
+
+    def setUp(self):
+        # версии кэшей меняются после коммита, а TestCase не коммитит
+        cache.clear()
+
+    def test_distances_follow_distance_mode(self):
+        order = SimpleNamespace(lat=55.75, long=37.62)
+        restaurant_ids = set(self.restaurants)
+        for mode in ['fast', 'exact']:
+            with self.settings(DISTANCE_MODE=mode):
+                [distances] = get_nearest_restaurant_distances(
+                    [order], [restaurant_ids], 3, self.restaurants
+                )
+                expected = sorted(
+                    zip(
+                        self.restaurants,
+                        get_distance_matrix(
+                            [(order.lat, order.long)],
+                            [(restaurant.lat, restaurant.long)
+                             for restaurant in self.restaurants.values()],
+                            mode=mode,
+                        )[0].tolist()
+                    ),
+                    key=lambda item: item[1]
+                )[:3]
+            self.assertEqual(
+                [restaurant_id for restaurant_id, _ in distances],
+                [restaurant_id for restaurant_id, _ in expected]
+            )
+            for (_, distance), (_, expected_distance) in zip(
+                distances, expected
+            ):
+                self.assertAlmostEqual(distance, expected_distance, places=2)
+
+
+def create_manager():
+    return User.objects.create_user(
+        'manager', password='password', is_staff=True
+    )
+
+
+def create_order():
+    return Order.objects.create(
+        address='Москва, ул. Тверская, 1',
+        customer_first_name='Иван',
+        phonenumber='+79001234567',
+    )
+
+
+def get_streamed_page(client):
+    response = client.get(reverse('restaurateur:view_orders'), {'stream': 1})
+    assert response.status_code == 200, response.status_code
+    return b''.join(response.streaming_content)
+
+
+# с DB_REPLICA_URLS страница читала бы из зеркала,
+# которому не видны данные незакоммиченной транзакции теста
+@override_settings(DATABASE_REPLICAS=[])
+class OrdersChangesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = create_manager()
+
+    def setUp(self):
+        self.client.force_login(self.manager)
+        self.now = django_timezone.now()
+
+    def create_order(self, updated_at, **fields):
+        order = Order.objects.create(
+            address='Москва, ул. Тверская, 1',
+            customer_first_name='Иван',
+            phonenumber='+79001234567',
+            **fields
+        )
+        # updated_at с auto_now задаётся только через update()
+        Order.objects.filter(pk=order.pk).update(updated_at=updated_at)
+        return order
+
+    def get_changes(self, cursor, **params):
+        response = self.client.get(
+            reverse('restaurateur:view_orders_changes'),
+            {'cursor': cursor, **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cursor_is_required(self):
+        response = self.client.get(
+            reverse('restaurateur:view_orders_changes'),
+            {'cursor': 'garbage'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_new_changes_advance_cursor(self):
+        cursor = format_cursor(self.now - timedelta(minutes=5), 0)
+        order = self.create_order(self.now - timedelta(minutes=1))
+
+        changes = self.get_changes(cursor)
+        self.assertEqual(
+            [item['id'] for item in changes['orders']], [order.id]
+        )
+        self.assertEqual(
+            parse_cursor(changes['cursor']),
+            (Order.objects.get(pk=order.pk).updated_at, order.id)
+        )
+        self.assertFalse(changes['has_more'])
+
+    def test_idle_board_gets_nothing(self):
+        # изменение старше окна повторной отдачи
+        order = self.create_order(self.now - timedelta(minutes=5))
+        cursor = format_cursor(
+            Order.objects.get(pk=order.pk).updated_at, order.id
+        )
+        for _ in range(2):
+            changes = self.get_changes(cursor)
+            self.assertEqual(changes['orders'], [])
+            self.assertEqual(changes['cursor'], cursor)
+
+    def test_late_commit_is_resent(self):
+        cursor_moment = self.now - timedelta(seconds=1)
+        # заказ с updated_at до курсора, закоммиченный после него
+        late_order = self.create_order(self.now - timedelta(seconds=5))
+        changes = self.get_changes(format_cursor(cursor_moment, 0))
+        self.assertEqual(
+            [item['id'] for item in changes['orders']],
+            [late_order.id]
+        )
+
+    def test_filtered_out_orders_are_removed(self):
+        cursor = format_cursor(self.now - timedelta(minutes=5), 0)
+        order = self.create_order(
+            self.now - timedelta(minutes=1), status='CLOSED'
+        )
+        changes = self.get_changes(cursor)
+        self.assertEqual(changes['orders'], [])
+        self.assertEqual(changes['removed'], [order.id])
+
+
+class StreamOrdersTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = create_manager()
+        create_order()
+
+    def setUp(self):
+        self.client.force_login(self.manager)
+
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_rows_are_read_from_request_database(self):
+        read_databases = []
+
+        def serialize_orders(*args):
+            read_databases.append(read_database.get())
+            return []
+
+        with mock.patch.object(
+            views, 'serialize_orders', side_effect=serialize_orders
+        ):
+            get_streamed_page(self.client)
+        self.assertEqual(read_databases, ['default'])
+
+
+@skipUnless(settings.DATABASE_REPLICAS, 'нужен DB_REPLICA_URLS')
+class StreamOrdersReplicaTest(TransactionTestCase):
+    # реплика в тестах - зеркало основной БД, и незакоммиченные
+    # данные TestCase ей не видны
+    databases = '__all__'
+
+    def setUp(self):
+        self.client.force_login(create_manager())
+        create_order()
+
+    def test_rows_are_read_from_replica(self):
+        replica = settings.DATABASE_REPLICAS[0]
+        with override_settings(DATABASE_REPLICAS=[replica]), \
+                CaptureQueriesContext(connections[replica]) as queries:
+            page = get_streamed_page(self.client)
+        tables = ' '.join(query['sql'] for query in queries)
+        self.assertIn('foodcartapp_order', tables)
+        self.assertIn('foodcartapp_restaurant', tables)
+        self.assertIn('Тверская', page.decode())
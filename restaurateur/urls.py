@@ -14,6 +14,19 @@ urlpatterns = [
 
     # TODO заглушка для нереализованного функционала
     path('orders/', views.view_orders, name="view_orders"),
+    path(
+        'orders/changes/',
+        views.view_orders_changes,
+        name="view_orders_changes"
+    ),
+
+    path(
+        'orders/assignments/',
+        views.view_assignments,
+        name="view_assignments"
+    ),
+
+    path('metrics/', views.view_metrics, name="view_metrics"),
 
     path('login/', views.LoginView.as_view(), name="login"),
     path('logout/', views.LogoutView.as_view(), name="logout"),
@@ -1,5 +1,12 @@
 from django import forms
+from django.core.paginator import Paginator
+from django.db.models import Max
 from django.shortcuts import redirect, render
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_http_methods
+from django.utils import timezone
+from django.template.loader import render_to_string
+from django.utils.dateparse import parse_datetime
 from django.views import View
 from django.urls import reverse_lazy
 from django.contrib.auth.decorators import user_passes_test
@@ -8,18 +15,23 @@ from django.contrib.auth import authenticate, login
 from django.contrib.auth import views as auth_views
 
 
+from foodcartapp.assignment import (
+    apply_assignments, get_order_restaurant_ids, propose_assignments
+)
+from foodcartapp.availability import get_availability_matrix
+from foodcartapp.metrics import registry
 from foodcartapp.models import Product, Restaurant
 from foodcartapp.models import Order, RestaurantMenuItem
-from geopy.distance import geodesic
-import requests
-from coordinates.models import Coordinates
-from foodcartapp.coordinates_api_functions import (
-    fetch_coordinates
-)
+from coordinates.distances import get_distance_matrix
+from foodcartapp.restaurants_index import find_nearest_restaurants
+from star_burger.replicas import read_database, read_from_replica, reads_from
 from django.conf import settings
-from django.db.models.query import Prefetch
-from foodcartapp.models import OrderItem
-import rollbar
+from datetime import timedelta
+from math import isnan
+import os
+
+
+ORDER_ROWS_MARKER = '<!-- order rows -->'
 
 
 class Login(forms.Form):
@@ -75,94 +87,119 @@ def is_manager(user):
 
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
+@read_from_replica
 def view_products(request):
-    restaurants = list(Restaurant.objects.order_by('name'))
-    products = list(Product.objects.prefetch_related('menu_items'))
-
-    default_availability = {restaurant.id: False for restaurant in restaurants}
-    products_with_restaurants = []
-    for product in products:
-
-        availability = {
-            **default_availability,
-            **{item.restaurant_id: item.availability for item in product.menu_items.all()},
-        }
-        orderer_availability = [availability[restaurant.id] for restaurant in restaurants]
-
-        products_with_restaurants.append(
-            (product, orderer_availability)
-        )
+    availability_matrix = get_availability_matrix()
+    restaurants_by_id = Restaurant.objects.in_bulk(
+        availability_matrix.restaurant_ids
+    )
+    restaurants = [
+        restaurants_by_id[restaurant_id]
+        for restaurant_id in availability_matrix.restaurant_ids
+        if restaurant_id in restaurants_by_id
+    ]
+
+    paginator = Paginator(
+        Product.objects.select_related('category').order_by('id'),
+        settings.MANAGER_PRODUCTS_PAGE_SIZE
+    )
+    page = paginator.get_page(request.GET.get('page'))
+    products_with_restaurants = [
+        (product, availability_matrix.get_row(product.id))
+        for product in page
+    ]
 
     return render(request, template_name="products_list.html", context={
         'products_with_restaurants': products_with_restaurants,
         'restaurants': restaurants,
+        'page': page,
     })
 
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
+@read_from_replica
 def view_restaurants(request):
     return render(request, template_name="restaurants_list.html", context={
         'restaurants': Restaurant.objects.all(),
     })
 
 
-def get_distance_for_address(order, restaurant):
-
-    if not (order.long and order.lat):
-        try:
-            order.long, order.lat = fetch_coordinates(
-                settings.YA_API_KEY,
-                order.address
+def get_restaurant_distances(orders, orders_restaurant_ids, restaurants):
+    restaurant_columns = {
+        restaurant_id: column
+        for column, restaurant_id in enumerate(restaurants)
+    }
+    distance_matrix = get_distance_matrix(
+        [(order.lat, order.long) for order in orders],
+        [(restaurant.lat, restaurant.long)
+         for restaurant in restaurants.values()],
+    ).tolist()
+
+    orders_distances = []
+    for restaurant_ids, distances in zip(orders_restaurant_ids,
+                                         distance_matrix):
+        order_distances = []
+        for restaurant_id in restaurant_ids:
+            distance = distances[restaurant_columns[restaurant_id]]
+            order_distances.append(
+                (restaurant_id, None if isnan(distance) else distance)
             )
-            Coordinates.objects.create(
-                address=order.address,
-                long=order.long,
-                lat=order.lat,
+        orders_distances.append(order_distances)
+    return orders_distances
+
+
+def get_nearest_restaurant_distances(orders, orders_restaurant_ids, limit,
+                                     restaurants):
+    # ближайшие выбираются по индексу на сфере, а в режиме exact
+    # расстояния до них пересчитываются геодезически
+    exact = settings.DISTANCE_MODE == 'exact'
+    orders_distances = []
+    for order, restaurant_ids in zip(orders, orders_restaurant_ids):
+        if order.lat is None or order.long is None:
+            orders_distances.append(
+                [(restaurant_id, None) for restaurant_id in restaurant_ids]
             )
-        except (
-            requests.exceptions.ReadTimeout,
-            requests.exceptions.ConnectionError,
-            requests.exceptions.HTTPError
-        ):
-            rollbar.report_message("Can't get coordinates", 'warning')
-            return
-
-    return round(
-        (geodesic(
-            (restaurant.lat, restaurant.long), (order.lat, order.long)
-        ).km), 2
-    )
-
-
-def serialize_order(order, menu_list):
-    avail_restaurants = []
-
-    for item in order.items.all():
-        item_restaurants = []
-
-        for menu_item in menu_list:
-            if menu_item.product == item.product:
-                item_restaurants.append(menu_item.restaurant)
-
-        if not avail_restaurants:
-            avail_restaurants = item_restaurants
-
-        avail_restaurants = list(
-            set(item_restaurants) & set(avail_restaurants)
+            continue
+        nearest = find_nearest_restaurants(
+            order.lat, order.long, limit, restaurant_ids
         )
+        if exact and nearest:
+            distances = get_distance_matrix(
+                [(order.lat, order.long)],
+                [
+                    (restaurants[restaurant_id].lat,
+                     restaurants[restaurant_id].long)
+                    for restaurant_id, _ in nearest
+                ],
+                mode='exact',
+            )[0].tolist()
+            nearest = sorted(
+                zip([restaurant_id for restaurant_id, _ in nearest],
+                    distances),
+                key=lambda item: item[1]
+            )
+        orders_distances.append([
+            (restaurant_id, round(distance, 2))
+            for restaurant_id, distance in nearest
+        ])
+    return orders_distances
 
+
+def serialize_order(order, restaurant_distances, restaurants):
     rest_distance = []
 
-    for restaurant in avail_restaurants:
-        distance = get_distance_for_address(order, restaurant)
+    for restaurant_id, distance in restaurant_distances:
         rest_distance.append(
             {
-                'name': restaurant.name,
+                'name': restaurants[restaurant_id].name,
                 'distance': distance,
             }
         )
 
-    order.restaurants = sorted(rest_distance, key=lambda x: x['distance'])
+    order.restaurants = sorted(
+        rest_distance,
+        key=lambda x: (x['distance'] is None, x['distance'] or 0)
+    )
 
     return {
         'id': order.id,
@@ -179,24 +216,245 @@ def serialize_order(order, menu_list):
     }
 
 
-@user_passes_test(is_manager, login_url='restaurateur:login')
-def view_orders(request):
+def serialize_orders(orders, restaurants_by_product, restaurants):
+    orders_restaurant_ids = [
+        get_order_restaurant_ids(order, restaurants_by_product)
+        for order in orders
+    ]
+
+    if settings.MANAGER_NEAREST_RESTAURANTS:
+        orders_distances = get_nearest_restaurant_distances(
+            orders,
+            orders_restaurant_ids,
+            settings.MANAGER_NEAREST_RESTAURANTS,
+            restaurants
+        )
+    else:
+        orders_distances = get_restaurant_distances(
+            orders, orders_restaurant_ids, restaurants
+        )
+
+    return [
+        serialize_order(order, restaurant_distances, restaurants)
+        for order, restaurant_distances in zip(orders, orders_distances)
+    ]
+
+
+def format_cursor(moment, order_id):
+    return f'{moment.isoformat() if moment else "null"}|{order_id}'
 
-    orders_with_coord = Order.objects.get_noprocessed_orders() \
-        .annotate_with_price() \
+
+def parse_cursor(cursor):
+    try:
+        moment, order_id = cursor.split('|')
+        order_id = int(order_id)
+    except ValueError:
+        return
+    if moment == 'null':
+        return None, order_id
+    moment = parse_datetime(moment)
+    if moment:
+        return moment, order_id
+
+
+def get_manager_orders():
+    return Order.objects.annotate_with_price() \
         .annotate_with_coords().select_related('restaurant') \
-        .prefetch_related(Prefetch(
-            'items', queryset=OrderItem.objects.select_related('product')
-            )).order_by('-called_at', '-id')
+        .prefetch_related('items').order_by_call()
+
+
+def filter_orders(orders, status, restaurant):
+    if status in dict(Order.STATUS_CHOICES):
+        orders = orders.filter(status=status)
+    else:
+        orders = orders.get_noprocessed_orders()
+
+    if restaurant == 'none':
+        orders = orders.filter(restaurant__isnull=True)
+    elif restaurant.isdigit():
+        orders = orders.filter(restaurant_id=int(restaurant))
+    return orders
+
+
+def iterate_order_pages(orders, page_size):
+    cursor = None
+    while True:
+        page_orders = orders.after_cursor(*cursor) if cursor else orders
+        page = list(page_orders[:page_size])
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        cursor = page[-1].called_at, page[-1].id
+
+
+def stream_orders(request, orders, context, database):
+    # страница рендерится без строк и отдаётся частями:
+    # шапка, строки заказов пачками по page_size, подвал.
+    # Генератор выполняется уже после выхода из view, поэтому БД
+    # для чтения, выбранная для запроса, задаётся заново
+    with reads_from(database):
+        page = render_to_string('order_items.html', context, request)
+        head, tail = page.split(ORDER_ROWS_MARKER)
+        yield head
+
+        restaurants_by_product = RestaurantMenuItem.objects.available() \
+            .get_restaurants_by_product()
+        restaurants = Restaurant.objects.in_bulk()
+        for page_orders in iterate_order_pages(
+            orders, settings.MANAGER_ORDERS_PAGE_SIZE
+        ):
+            for item in serialize_orders(
+                page_orders, restaurants_by_product, restaurants
+            ):
+                yield render_to_string(
+                    'order_item_row.html', {'item': item}, request
+                )
+        yield tail
 
-    menu_list = list(
-        RestaurantMenuItem.objects.select_related('product', 'restaurant')
-        .filter(availability=True)
-    )
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+@read_from_replica
+def view_orders(request):
+    status = request.GET.get('status', '')
+    restaurant = request.GET.get('restaurant', '')
+    # курсор изменений - по той же БД, из которой читается страница:
+    # now() сервера обогнал бы отстающую реплику, и заказы из отставания
+    # не попали бы ни на страницу, ни в изменения
+    last_updated_at = Order.objects.aggregate(
+        last_updated_at=Max('updated_at')
+    )['last_updated_at']
+    changes_cursor = format_cursor(last_updated_at or timezone.now(), 0)
+
+    orders = filter_orders(get_manager_orders(), status, restaurant)
 
     context = {
-        'order_items': [
-            serialize_order(order, menu_list) for order in orders_with_coord
-        ]
+        'changes_cursor': changes_cursor,
+        'poll_interval': settings.MANAGER_ORDERS_POLL_INTERVAL,
+        'statuses': Order.STATUS_CHOICES,
+        'restaurants': Restaurant.objects.order_by('name'),
+        'selected_status': status,
+        'selected_restaurant': restaurant,
     }
+
+    if request.GET.get('stream'):
+        return StreamingHttpResponse(stream_orders(
+            request,
+            orders,
+            {**context, 'order_items': [], 'streaming': True},
+            read_database.get(),
+        ))
+
+    cursor = parse_cursor(request.GET.get('cursor', ''))
+    if cursor:
+        orders = orders.after_cursor(*cursor)
+
+    page_size = settings.MANAGER_ORDERS_PAGE_SIZE
+    page_orders = list(orders[:page_size + 1])
+    next_cursor = None
+    if len(page_orders) > page_size:
+        page_orders = page_orders[:page_size]
+        next_cursor = format_cursor(
+            page_orders[-1].called_at, page_orders[-1].id
+        )
+
+    restaurants_by_product = RestaurantMenuItem.objects.available() \
+        .get_restaurants_by_product()
+    restaurants = Restaurant.objects.in_bulk()
+
+    context['order_items'] = serialize_orders(
+        page_orders, restaurants_by_product, restaurants
+    )
+    context['next_cursor'] = next_cursor
     return render(request, template_name='order_items.html', context=context)
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+@read_from_replica
+def view_orders_changes(request):
+    cursor = parse_cursor(request.GET.get('cursor', ''))
+    if not cursor or not cursor[0]:
+        return JsonResponse({'error': 'cursor is required'}, status=400)
+
+    page_size = settings.MANAGER_ORDERS_PAGE_SIZE
+    changes = list(
+        Order.objects.changed_after(*cursor)
+        .values_list('id', 'updated_at')[:page_size]
+    )
+    # недавние изменения до курсора отдаются повторно,
+    # клиент заменяет строки по id
+    late_ids = Order.objects.changed_shortly_before(
+        cursor[0],
+        timedelta(seconds=settings.MANAGER_ORDERS_CHANGES_OVERLAP)
+    ).values_list('id', flat=True)[:page_size]
+    changed_ids = sorted(
+        {order_id for order_id, _ in changes} | set(late_ids)
+    )
+    if not changed_ids:
+        return JsonResponse({
+            'cursor': format_cursor(*cursor),
+            'has_more': False,
+            'orders': [],
+            'removed': [],
+        })
+
+    orders = list(filter_orders(
+        get_manager_orders().filter(id__in=changed_ids),
+        request.GET.get('status', ''),
+        request.GET.get('restaurant', '')
+    ))
+    restaurants_by_product = RestaurantMenuItem.objects.available() \
+        .get_restaurants_by_product()
+    restaurants = Restaurant.objects.in_bulk()
+    items = serialize_orders(orders, restaurants_by_product, restaurants)
+
+    if changes:
+        last_id, last_updated_at = changes[-1]
+        cursor = last_updated_at, last_id
+    return JsonResponse({
+        'cursor': format_cursor(*cursor),
+        'has_more': len(changes) == page_size,
+        'orders': [
+            {
+                'id': item['id'],
+                'restaurants': item['restaurants'],
+                'row': render_to_string(
+                    'order_item_row.html', {'item': item}, request
+                ),
+            }
+            for item in items
+        ],
+        'removed': sorted(set(changed_ids) - {order.id for order in orders}),
+    })
+
+
+@require_http_methods(['GET', 'POST'])
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def view_assignments(request):
+    # GET - предложить рестораны для неназначенных заказов, POST - назначить
+    proposals = propose_assignments()
+    response = {
+        'assignments': [
+            {
+                'order': proposal['order_id'],
+                'restaurant': proposal['restaurant'].id,
+                'restaurant_name': proposal['restaurant'].name,
+                'distance': proposal['distance'],
+            }
+            for proposal in proposals
+        ],
+    }
+    if request.method == 'POST':
+        response['applied'] = apply_assignments(proposals)
+    return JsonResponse(response, json_dumps_params={'ensure_ascii': False})
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def view_metrics(request):
+    # сводка только по текущему процессу
+    return JsonResponse({
+        'pid': os.getpid(),
+        'query_budgets': settings.METRICS_QUERY_BUDGETS,
+        'time_budgets': settings.METRICS_TIME_BUDGETS,
+        'views': registry.snapshot(),
+    }, json_dumps_params={'ensure_ascii': False})
@@ -0,0 +1,80 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+# реплика, из которой читает текущий запрос, None - читать из основной БД
+read_database = ContextVar('read_database', default=None)
+
+PRIMARY_UNTIL_SESSION_KEY = 'db_primary_until'
+
+
+@contextmanager
+def reads_from(alias):
+    token = read_database.set(alias)
+    try:
+        yield
+    finally:
+        read_database.reset(token)
+
+
+def replica_reads(enabled=True):
+    # одна реплика на весь блок, чтобы не смешивать разное отставание
+    replicas = settings.DATABASE_REPLICAS
+    alias = random.choice(replicas) if enabled and replicas else None
+    return reads_from(alias)
+
+
+def primary_reads():
+    # например, для кэшей по версиям: собранные из отстающей реплики,
+    # они хранили бы старые данные до следующей смены версии
+    return replica_reads(enabled=False)
+
+
+def is_pinned_to_primary(request):
+    session = getattr(request, 'session', None)
+    if session is None:
+        return False
+    return session.get(PRIMARY_UNTIL_SESSION_KEY, 0) > time.time()
+
+
+def read_from_replica(view):
+    # только для view, которые ничего не пишут в БД
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with replica_reads(not is_pinned_to_primary(request)):
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return read_database.get() or 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReplicaStickinessMiddleware:
+    # после изменений сотрудник какое-то время читает из основной БД
+    # и видит свои правки, даже если реплика отстаёт
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if settings.DATABASE_REPLICAS \
+                and request.method not in ('GET', 'HEAD', 'OPTIONS') \
+                and request.user.is_authenticated:
+            request.session[PRIMARY_UNTIL_SESSION_KEY] = \
+                time.time() + settings.DB_REPLICA_STICKY_SECONDS
+        return response
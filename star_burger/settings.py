@@ -3,8 +3,6 @@ import os
 import dj_database_url
 
 from environs import Env
-from git import Repo
-import dj_database_url
 
 
 env = Env()
@@ -31,23 +29,34 @@ INSTALLED_APPS = [
     'phonenumber_field',
     'rest_framework',
     'coordinates',
-    'debug_toolbar',
+    'benchmarks',
 ]
 
 MIDDLEWARE = [
+    'foodcartapp.middleware.MetricsMiddleware',
     'rollbar.contrib.django.middleware.RollbarNotifierMiddlewareOnly404',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'star_burger.replicas.ReplicaStickinessMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
     'rollbar.contrib.django.middleware.RollbarNotifierMiddleware',
     'rollbar.contrib.django.middleware.RollbarNotifierMiddlewareExcluding404',
 ]
 
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    clickjacking_index = MIDDLEWARE.index(
+        'django.middleware.clickjacking.XFrameOptionsMiddleware'
+    )
+    MIDDLEWARE.insert(
+        clickjacking_index + 1,
+        'debug_toolbar.middleware.DebugToolbarMiddleware'
+    )
+
 ROOT_URLCONF = 'star_burger.urls'
 
 DEBUG_TOOLBAR_PANELS = [
@@ -94,6 +103,33 @@ DATABASES = {}
 DB_URL = os.getenv('DB_URL')
 DATABASES['default'] = dj_database_url.parse(DB_URL, conn_max_age=600)
 
+# реплики только для чтения, читают из них view с декоратором
+# star_burger.replicas.read_from_replica. В тестах вместо реплик
+# используется основная БД
+DATABASE_REPLICAS = []
+for number, replica_url in enumerate(env.list('DB_REPLICA_URLS', [])):
+    alias = f'replica_{number}'
+    DATABASES[alias] = dj_database_url.parse(replica_url, conn_max_age=600)
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ['star_burger.replicas.ReplicaRouter']
+# сколько секунд после изменений сотрудник читает из основной БД
+DB_REPLICA_STICKY_SECONDS = env.int('DB_REPLICA_STICKY_SECONDS', 10)
+
+CACHES = {
+    'default': env.dj_cache_url('CACHE_URL', 'locmem://'),
+}
+CATALOG_CACHE_TIMEOUT = env.int('CATALOG_CACHE_TIMEOUT', 60 * 60)
+# locmem-кэш у каждого процесса свой, и смену версии кэшей видит только
+# процесс, сохранивший изменения. Поэтому без общего кэша версии живут
+# недолго, и остальные воркеры пересобирают кэши не реже этого интервала
+CACHE_IS_SHARED = not CACHES['default']['BACKEND'].endswith(
+    ('LocMemCache', 'DummyCache')
+)
+CACHE_VERSION_TIMEOUT = None if CACHE_IS_SHARED \
+    else env.int('CACHE_VERSION_TIMEOUT', 10)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -143,21 +179,127 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
     ],
 }
+if DEBUG:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append(
+        'rest_framework.renderers.BrowsableAPIRenderer'
+    )
 
 YA_API_KEY = env('YA_API_KEY', '')
 
+# заказы с одинаковым телом запроса в пределах окна (в секундах) считаются
+# повтором, если клиент не прислал заголовок Idempotency-Key. 0 - отключить
+ORDER_DEDUP_WINDOW = env.int('ORDER_DEDUP_WINDOW', 60)
+# сколько секунд хранить ответ на принятый заказ для повторных запросов
+ORDER_IDEMPOTENCY_TTL = env.int('ORDER_IDEMPOTENCY_TTL', 24 * 60 * 60)
+# заказы сначала попадают в очередь OrderIntake и отвечают 202,
+# в Order их переносит команда process_order_intake
+ORDER_INTAKE_QUEUE = env.bool('ORDER_INTAKE_QUEUE', False)
+ORDER_INTAKE_BATCH_SIZE = env.int('ORDER_INTAKE_BATCH_SIZE', 100)
+# пауза обработчика очереди, когда она пуста, в секундах
+ORDER_INTAKE_POLL_INTERVAL = env.float('ORDER_INTAKE_POLL_INTERVAL', 1)
+
+# ширины миниатюр картинок товаров в пикселях
+PRODUCT_THUMBNAIL_WIDTHS = env.list(
+    'PRODUCT_THUMBNAIL_WIDTHS',
+    [100, 300, 600],
+    subcast=int
+)
+
+# geocoding settings
+GEOCODER = env(
+    'GEOCODER',
+    'coordinates.geocoding.yandex_geocoder'
+)
+GEOCODE_ON_ORDER_CREATE = env.bool('GEOCODE_ON_ORDER_CREATE', True)
+GEOCODER_MAX_WORKERS = env.int('GEOCODER_MAX_WORKERS', 4)
+GEOCODER_BATCH_SIZE = env.int('GEOCODER_BATCH_SIZE', 50)
+GEOCODER_TIMEOUT = env.float('GEOCODER_TIMEOUT', 5)
+GEOCODER_RETRIES = env.int('GEOCODER_RETRIES', 3)
+GEOCODER_BACKOFF_FACTOR = env.float('GEOCODER_BACKOFF_FACTOR', 0.5)
+GEOCODER_CACHE_SIZE = env.int('GEOCODER_CACHE_SIZE', 10000)
+GEOCODER_CACHE_TTL = env.int('GEOCODER_CACHE_TTL', 60 * 60)
+GEOCODER_REFRESH_AFTER_DAYS = env.int('GEOCODER_REFRESH_AFTER_DAYS', 90)
+
+# 'fast' - гаверсинус по всей матрице заказов и ресторанов за один проход,
+# 'exact' - geopy.distance.geodesic для каждой пары
+DISTANCE_MODE = env('DISTANCE_MODE', 'fast')
+# сколько ближайших ресторанов показывать для заказа, 0 - все подходящие
+MANAGER_NEAREST_RESTAURANTS = env.int('MANAGER_NEAREST_RESTAURANTS', 0)
+# сколько км расстояния стоит каждый незавершённый заказ ресторана
+# при автоматическом назначении ресторанов
+ASSIGNMENT_LOAD_PENALTY_KM = env.float('ASSIGNMENT_LOAD_PENALTY_KM', 1.0)
+MANAGER_ORDERS_PAGE_SIZE = env.int('MANAGER_ORDERS_PAGE_SIZE', 100)
+MANAGER_PRODUCTS_PAGE_SIZE = env.int('MANAGER_PRODUCTS_PAGE_SIZE', 100)
+# как часто (в секундах) страница заказов запрашивает изменения, 0 - никогда
+MANAGER_ORDERS_POLL_INTERVAL = env.int('MANAGER_ORDERS_POLL_INTERVAL', 10)
+# заказы, изменённые за последние столько секунд, но до курсора,
+# отдаются повторно: транзакция могла закоммитить их позже заказов
+# с большим updated_at
+MANAGER_ORDERS_CHANGES_OVERLAP = env.int('MANAGER_ORDERS_CHANGES_OVERLAP', 30)
+
+# метрики запросов, сводка доступна менеджерам на /manager/metrics/
+METRICS_ENABLED = env.bool('METRICS_ENABLED', True)
+METRICS_LOG_REQUESTS = env.bool('METRICS_LOG_REQUESTS', False)
+# при превышении бюджета в лог пишется предупреждение
+METRICS_QUERY_BUDGETS = env.dict(
+    'METRICS_QUERY_BUDGETS',
+    {
+        'foodcartapp:product_list_api': 5,
+        'foodcartapp:register_order': 10,
+        'restaurateur:ProductsView': 10,
+        'restaurateur:view_orders': 20,
+        'restaurateur:view_orders_changes': 20,
+    },
+    subcast_values=int,
+)
+# в миллисекундах
+METRICS_TIME_BUDGETS = env.dict(
+    'METRICS_TIME_BUDGETS',
+    {
+        'foodcartapp:product_list_api': 200,
+        'foodcartapp:register_order': 300,
+        'restaurateur:view_orders': 1000,
+    },
+    subcast_values=int,
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'foodcartapp.middleware': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # rollbar settings
-local_repo = Repo(path=BASE_DIR)
-local_branch = local_repo.active_branch.name
+# ветка и коммит берутся из окружения или из файла REVISION, который
+# пишет скрипт деплоя, чтобы не запускать git при каждом импорте настроек
+REVISION_FILE = os.path.join(BASE_DIR, 'REVISION')
+revision = []
+if os.path.exists(REVISION_FILE):
+    with open(REVISION_FILE) as revision_file:
+        revision = revision_file.read().split()
+GIT_BRANCH = env('GIT_BRANCH', revision[0] if revision else 'master')
+GIT_REVISION = env('GIT_REVISION', revision[1] if len(revision) > 1 else '')
 
+# rollbar инициализируют его middleware при старте воркера,
+# а management-команды - сами, если им это нужно
 ROLLBAR = {
     'access_token': env('ROLLBAR_TOKEN', 'default'),
     'environment': 'development' if DEBUG else 'production',
     'root': BASE_DIR,
-    'branch': local_branch,
+    'branch': GIT_BRANCH,
 }
-import rollbar
-rollbar.init(**ROLLBAR)
\ No newline at end of file
+if GIT_REVISION:
+    ROLLBAR['code_version'] = GIT_REVISION